@@ -0,0 +1,263 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from main import generate_boxes
+from optimizer import build_mask_index, crossover, evaluate, generate_individual, iterate_optimization, SEEDING_STRATEGIES
+
+
+#powtarzalne pomiary wydajnosci optymalizatora
+#
+#  python benchmark.py run --output baseline.json      - pomiar i zapis wynikow
+#  python benchmark.py compare baseline.json            - pomiar i porownanie z zapisanymi wynikami,
+#                                                         kod wyjscia 1 gdy cos zwolnilo bardziej niz --threshold
+#
+#kazdy zestaw ma staly seed, pudelka z main.generate_boxes i maske z losowymi przeszkodami (obstruction)
+#
+#czas do celu: wynikiem docelowym jest najlepszy wynik przebiegu z losowa populacja poczatkowa,
+#a ten sam przebieg z heurystyczna populacja (--seeding, --polish) mierzy, po ilu pokoleniach i sekundach go osiaga
+#
+#--racing N - przebiegi z ocena wyscigiem; racedOut i savedGenes mowia, ile dekodowania zostalo pominiete
+
+WORKLOADS = [
+    {'name': 'grid16-boxes150', 'gridSize': 16, 'boxCount': 150, 'boxSizes': (1, 5), 'obstruction': 0.0, 'populationSize': 50, 'generations': 10},
+    {'name': 'grid16-obstructed', 'gridSize': 16, 'boxCount': 150, 'boxSizes': (1, 5), 'obstruction': 0.3, 'populationSize': 50, 'generations': 10},
+    {'name': 'grid64-boxes500', 'gridSize': 64, 'boxCount': 500, 'boxSizes': (1, 5), 'obstruction': 0.0, 'populationSize': 50, 'generations': 3},
+    {'name': 'grid64-obstructed', 'gridSize': 64, 'boxCount': 500, 'boxSizes': (1, 5), 'obstruction': 0.2, 'populationSize': 50, 'generations': 3},
+    {'name': 'grid128-boxes1000', 'gridSize': 128, 'boxCount': 1000, 'boxSizes': (2, 10), 'obstruction': 0.05, 'populationSize': 20, 'generations': 2},
+    {'name': 'grid256-boxes600', 'gridSize': 256, 'boxCount': 600, 'boxSizes': (4, 24), 'obstruction': 0.0, 'populationSize': 10, 'generations': 1},
+    {'name': 'grid512-boxes400', 'gridSize': 512, 'boxCount': 400, 'boxSizes': (8, 48), 'obstruction': 0.0, 'populationSize': 10, 'generations': 1},
+]
+
+#zestawy do szybkiego sprawdzenia (--quick)
+QUICK_WORKLOADS = ('grid16-boxes150', 'grid16-obstructed', 'grid64-boxes500')
+
+#metryki porownywane w trybie compare - wszystkie "im wiecej, tym lepiej"
+THROUGHPUT_METRICS = ('evaluationsPerSecond', 'boxesPlacedPerSecond', 'crossoversPerSecond', 'runEvaluationsPerSecond')
+
+SEED = 12345
+
+
+def build_workload(workload):
+    random.seed(SEED)
+    low, high = workload['boxSizes']
+    boxes = generate_boxes(workload['boxCount'], low, high, low, high)
+    
+    size = workload['gridSize']
+    maskRandom = random.Random(SEED + 1)
+    mask = [[0 if maskRandom.random() < workload['obstruction'] else 1 for _ in range(size)] for _ in range(size)]
+    
+    population = [generate_individual(boxes) for _ in range(workload['populationSize'])]
+    return boxes, mask, population
+
+
+#najlepszy (najkrotszy) z kilku pomiarow i szczyt pamieci z pierwszego
+def measure(function, repeats):
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    best = None
+    value = None
+    for _ in range(repeats):
+        startTime = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - startTime
+        best = elapsed if best is None else min(best, elapsed)
+    return best, peak, value
+
+
+#pierwsze pokolenie (i czas), w ktorym najlepszy dotychczas wynik osiagnal target; None - nie osiagnal
+def time_to_target(history, target):
+    for stats in history:
+        if stats['bestSoFar'] >= target:
+            return stats['generation'], stats['elapsed']
+    return None, None
+
+
+#przebieg optymalizacji z zapisanymi statystykami kazdego pokolenia
+def run_with_history(boxes, mask, size, workload, options):
+    random.seed(SEED)
+    steps = iterate_optimization(boxes, mask, size, size, workload['generations'], workload['populationSize'], 0.5, **options)
+    history = []
+    while True:
+        try:
+            history.append(next(steps))
+        except StopIteration as stop:
+            return stop.value, history
+
+
+def run_workload(workload, repeats=3, options=None, seedingOptions=None):
+    options = options or {}
+    seedingOptions = seedingOptions or {'seeding': list(SEEDING_STRATEGIES)}
+    boxes, mask, population = build_workload(workload)
+    size = workload['gridSize']
+    maskIndex = build_mask_index(mask, boxes, size, size)
+    
+    def evaluate_all():
+        return sum(evaluate(ind, mask, boxes, size, size, maskIndex, options.get('decoder', 'grid'))[0] for ind in population)
+    
+    def crossover_all():
+        random.seed(SEED)
+        for k in range(len(population) - 1):
+            crossover(population[k], population[k + 1])
+        return len(population) - 1
+    
+    def optimize():
+        return run_with_history(boxes, mask, size, workload, options)
+    
+    evaluateTime, evaluatePeak, placedBoxes = measure(evaluate_all, repeats)
+    crossoverTime, _, crossovers = measure(crossover_all, repeats)
+    runTime, runPeak, (result, history) = measure(optimize, 1)
+    
+    #ocena populacji poczatkowej, kazde pokolenie i populacja koncowa
+    runEvaluations = workload['populationSize'] * (result['generationsRun'] + 2)
+    
+    targetScore = result['bestScore']
+    randomGenerations, randomSeconds = time_to_target(history, targetScore)
+    seededResult, seededHistory = run_with_history(boxes, mask, size, workload, {**options, **seedingOptions})
+    seededGenerations, seededSeconds = time_to_target(seededHistory, targetScore)
+    
+    return {
+        'evaluateSeconds': evaluateTime,
+        'evaluationsPerSecond': len(population) / evaluateTime,
+        'boxesPlacedPerSecond': placedBoxes / evaluateTime,
+        'crossoversPerSecond': crossovers / crossoverTime,
+        'runSeconds': runTime,
+        'runEvaluationsPerSecond': runEvaluations / runTime,
+        'bestScore': result['bestScore'],
+        'racedOut': result['racedOut'],
+        'savedGenes': result['savedGenes'],
+        'peakMemoryBytes': max(evaluatePeak, runPeak),
+        'targetScore': targetScore,
+        'randomGenerationsToTarget': randomGenerations,
+        'randomSecondsToTarget': randomSeconds,
+        'seededBestScore': seededResult['bestScore'],
+        'seededGenerationsToTarget': seededGenerations,
+        'seededSecondsToTarget': seededSeconds
+    }
+
+
+def run_benchmarks(names=None, repeats=3, options=None, seedingOptions=None, log=sys.stderr):
+    results = {}
+    for workload in WORKLOADS:
+        if names is not None and workload['name'] not in names:
+            continue
+        
+        print(f"{workload['name']}...", file=log, flush=True)
+        metrics = run_workload(workload, repeats, options, seedingOptions)
+        params = {name: value for name, value in workload.items() if name != 'name'}
+        results[workload['name']] = {'params': params, 'metrics': metrics}
+    
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seed': SEED,
+            'repeats': repeats,
+            'options': options or {},
+            'seedingOptions': seedingOptions or {},
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'workloads': results
+    }
+
+
+#lista (zestaw, metryka, baseline, teraz, zmiana) i czy ktoras zmiana przekracza prog
+#spowolnienie = baseline / teraz - 1, np. 0.25 to 25% mniej operacji na sekunde
+def compare_results(baseline, current, threshold):
+    rows = []
+    failed = False
+    for name, entry in current['workloads'].items():
+        baseEntry = baseline['workloads'].get(name)
+        if baseEntry is None:
+            continue
+        for metric in THROUGHPUT_METRICS:
+            before = baseEntry['metrics'].get(metric)
+            after = entry['metrics'].get(metric)
+            if not before or not after:
+                continue
+            slowdown = before / after - 1
+            regressed = slowdown > threshold
+            failed = failed or regressed
+            rows.append((name, metric, before, after, slowdown, regressed))
+    return rows, failed
+
+
+def print_results(results):
+    print(f"{'zestaw':<22}{'ocen/s':>12}{'pudelek/s':>14}{'crossover/s':>14}{'run [s]':>10}{'wynik':>8}{'pamiec [MB]':>14}")
+    for name, entry in results['workloads'].items():
+        metrics = entry['metrics']
+        print(f"{name:<22}{metrics['evaluationsPerSecond']:>12.1f}{metrics['boxesPlacedPerSecond']:>14.0f}"
+              f"{metrics['crossoversPerSecond']:>14.0f}{metrics['runSeconds']:>10.2f}{metrics['bestScore']:>8}"
+              f"{metrics['peakMemoryBytes'] / 1e6:>14.1f}")
+    
+    #pokolenia i sekundy do wyniku docelowego: losowa populacja poczatkowa / heurystyczna
+    print()
+    print(f"{'zestaw':<22}{'cel':>6}{'losowa: pokolen':>18}{'[s]':>8}{'heurystyki: pokolen':>22}{'[s]':>8}{'wynik':>8}")
+    for name, entry in results['workloads'].items():
+        metrics = entry['metrics']
+        print(f"{name:<22}{metrics['targetScore']:>6}{format_optional(metrics['randomGenerationsToTarget'], 'd'):>18}"
+              f"{format_optional(metrics['randomSecondsToTarget'], '.2f'):>8}{format_optional(metrics['seededGenerationsToTarget'], 'd'):>22}"
+              f"{format_optional(metrics['seededSecondsToTarget'], '.2f'):>8}{metrics['seededBestScore']:>8}")
+
+
+def format_optional(value, spec):
+    return '-' if value is None else format(value, spec)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark optymalizatora")
+    parser.add_argument('mode', choices=['run', 'compare'])
+    parser.add_argument('baseline', nargs='?', help="plik z wynikami bazowymi (compare)")
+    parser.add_argument('--output', help="zapisz wyniki do pliku JSON")
+    parser.add_argument('--threshold', type=float, default=0.2, help="dopuszczalne spowolnienie (0.2 = 20%%)")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--quick', action='store_true', help="tylko male zestawy")
+    parser.add_argument('--workload', action='append', help="tylko wybrane zestawy (mozna podac kilka razy)")
+    parser.add_argument('--decoder', default='grid')
+    parser.add_argument('--seeding', default=','.join(SEEDING_STRATEGIES), help="strategie populacji poczatkowej, po przecinku")
+    parser.add_argument('--seed-fraction', type=float, default=0.2)
+    parser.add_argument('--polish', type=int, default=0, help="kroki przeszukiwania lokalnego na osobnika")
+    parser.add_argument('--racing', type=int, default=0, help="sprawdzenia granicy na osobnika przy ocenie wyscigiem (0 - pelna ocena)")
+    args = parser.parse_args(argv)
+    
+    if args.mode == 'compare' and not args.baseline:
+        parser.error("compare wymaga pliku z wynikami bazowymi")
+    
+    names = args.workload
+    if names is None and args.quick:
+        names = QUICK_WORKLOADS
+    
+    seedingOptions = {'seeding': args.seeding.split(','), 'seedFraction': args.seed_fraction, 'polish': args.polish}
+    results = run_benchmarks(names, args.repeats, {'decoder': args.decoder, 'racing': args.racing}, seedingOptions)
+    print_results(results)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as outputFile:
+            json.dump(results, outputFile, indent=2)
+    
+    if args.mode == 'compare':
+        with open(args.baseline, encoding='utf-8') as baselineFile:
+            baseline = json.load(baselineFile)
+        
+        rows, failed = compare_results(baseline, results, args.threshold)
+        print()
+        for name, metric, before, after, slowdown, regressed in rows:
+            mark = "  <-- REGRESJA" if regressed else ""
+            print(f"{name:<22}{metric:<26}{before:>14.1f}{after:>14.1f}{-slowdown:>+10.1%}{mark}")
+        return 1 if failed else 0
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
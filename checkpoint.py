@@ -0,0 +1,183 @@
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+
+#zapis stanu dlugiej optymalizacji, zeby mozna ja bylo wznowic po przerwaniu
+#run_optimization(..., checkpoint='przebieg.ckpt', checkpointInterval=10) zapisuje stan co 10 pokolen,
+#a z resume=True zaczyna od zapisanego stanu - wynik jest taki sam jak bez przerwy
+#
+#format pliku (little endian):
+#  naglowek HEADER, populacja (permutacje uint16/uint32 + obroty spakowane bitami),
+#  najlepszy osobnik (jezeli jest), stan random (625 x uint32 + gauss), stan generatora NumPy (breeding='array'),
+#  na koncu CRC32 calosci
+
+MAGIC = b'BOXCKPT1'
+
+#magic, liczba pudelek, wielkosc populacji, ukonczone pokolenia, najlepszy wynik, najgorszy wynik,
+#pokolenie ostatniej poprawy, najlepszy i najgorszy wynik pierwszego pokolenia, czas do tej pory, czy jest najlepszy, czy jest rng
+HEADER = struct.Struct('<8sIIIiiiiidBB')
+RANDOM_STATE = struct.Struct('<625IBd')
+RNG_STATE = struct.Struct('<16s16sII')
+CRC = struct.Struct('<I')
+
+
+#permutacje w najmniejszym typie, ktory pomiesci numery pudelek
+def gene_dtype(boxCount):
+    return np.dtype('<u2') if boxCount <= 0xFFFF else np.dtype('<u4')
+
+
+def pack_genes(perms, rots, boxCount):
+    return perms.astype(gene_dtype(boxCount)).tobytes() + np.packbits(rots, axis=-1).tobytes()
+
+
+def unpack_genes(data, offset, rows, boxCount):
+    dtype = gene_dtype(boxCount)
+    perms = np.frombuffer(data, dtype=dtype, count=rows * boxCount, offset=offset).reshape(rows, boxCount)
+    offset += perms.nbytes
+    
+    rowBytes = (boxCount + 7) // 8
+    bits = np.frombuffer(data, dtype=np.uint8, count=rows * rowBytes, offset=offset).reshape(rows, rowBytes)
+    rots = np.unpackbits(bits, axis=1, count=boxCount).astype(bool)
+    return perms.astype(np.int32), rots, offset + bits.nbytes
+
+
+#stan: slownik jak z optimize (perms, rots, bestPerm, bestRots, randomState, rngState i liczniki)
+def pack_checkpoint(state):
+    boxCount = state['boxCount']
+    perms, rots = state['perms'], state['rots']
+    hasBest = state['bestPerm'] is not None
+    rngState = state['rngState']
+    
+    parts = [HEADER.pack(
+        MAGIC, boxCount, len(perms), state['generation'],
+        state['bestScore'], state['worstScore'], state['lastImprovement'],
+        state['firstGenBestScore'], state['firstGenWorstScore'], state['elapsed'],
+        hasBest, rngState is not None
+    )]
+    parts.append(pack_genes(perms, rots, boxCount))
+    if hasBest:
+        parts.append(pack_genes(state['bestPerm'][None, :], state['bestRots'][None, :], boxCount))
+    
+    #random.getstate() = (wersja, 624 slowa + pozycja, gauss_next)
+    _, words, gaussNext = state['randomState']
+    parts.append(RANDOM_STATE.pack(*words, gaussNext is not None, gaussNext or 0.0))
+    
+    if rngState is not None:
+        parts.append(RNG_STATE.pack(
+            rngState['state']['state'].to_bytes(16, 'little'),
+            rngState['state']['inc'].to_bytes(16, 'little'),
+            rngState['has_uint32'],
+            rngState['uinteger']
+        ))
+    
+    data = b''.join(parts)
+    return data + CRC.pack(zlib.crc32(data))
+
+
+def unpack_checkpoint(data):
+    if len(data) < HEADER.size + CRC.size or data[:len(MAGIC)] != MAGIC:
+        raise ValueError("To nie jest plik stanu optymalizacji")
+    (crc,) = CRC.unpack_from(data, len(data) - CRC.size)
+    if zlib.crc32(data[:-CRC.size]) != crc:
+        raise ValueError("Uszkodzony plik stanu optymalizacji (zla suma kontrolna)")
+    
+    (_, boxCount, populationSize, generation, bestScore, worstScore, lastImprovement,
+     firstGenBestScore, firstGenWorstScore, elapsed, hasBest, hasRng) = HEADER.unpack_from(data)
+    offset = HEADER.size
+    
+    perms, rots, offset = unpack_genes(data, offset, populationSize, boxCount)
+    bestPerm = bestRots = None
+    if hasBest:
+        bestPerms, bestRotsRows, offset = unpack_genes(data, offset, 1, boxCount)
+        bestPerm, bestRots = bestPerms[0], bestRotsRows[0]
+    
+    values = RANDOM_STATE.unpack_from(data, offset)
+    offset += RANDOM_STATE.size
+    randomState = (3, values[:625], values[626] if values[625] else None)
+    
+    rngState = None
+    if hasRng:
+        state, inc, hasUint32, uinteger = RNG_STATE.unpack_from(data, offset)
+        rngState = {
+            'bit_generator': 'PCG64',
+            'state': {'state': int.from_bytes(state, 'little'), 'inc': int.from_bytes(inc, 'little')},
+            'has_uint32': hasUint32,
+            'uinteger': uinteger
+        }
+    
+    return {
+        'boxCount': boxCount,
+        'generation': generation,
+        'bestScore': bestScore,
+        'worstScore': worstScore,
+        'lastImprovement': lastImprovement,
+        'firstGenBestScore': firstGenBestScore,
+        'firstGenWorstScore': firstGenWorstScore,
+        'elapsed': elapsed,
+        'perms': perms,
+        'rots': rots,
+        'bestPerm': bestPerm,
+        'bestRots': bestRots,
+        'randomState': randomState,
+        'rngState': rngState
+    }
+
+
+#zapis atomowy - najpierw plik tymczasowy, potem podmiana, wiec przerwany zapis nie psuje poprzedniego stanu
+def save_checkpoint(state, path):
+    temporaryPath = path + '.tmp'
+    with open(temporaryPath, 'wb') as checkpointFile:
+        checkpointFile.write(pack_checkpoint(state))
+        checkpointFile.flush()
+        os.fsync(checkpointFile.fileno())
+    os.replace(temporaryPath, path)
+
+
+def load_checkpoint(path):
+    with open(path, 'rb') as checkpointFile:
+        return unpack_checkpoint(checkpointFile.read())
+
+
+#zapis w osobnym watku, petla pokolen tylko oddaje stan
+#jezeli poprzedni zapis jeszcze trwa, czekajacy stan jest zastepowany nowszym
+class CheckpointWriter:
+    def __init__(self, path):
+        self.path = path
+        self.pending = None
+        self.closed = False
+        self.error = None
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+    
+    def submit(self, state):
+        with self.condition:
+            self.pending = state
+            self.condition.notify()
+    
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                state, self.pending = self.pending, None
+            
+            try:
+                save_checkpoint(state, self.path)
+            except OSError as error:
+                self.error = error
+    
+    #czeka na zapis ostatniego stanu i zwraca blad ostatniego nieudanego zapisu (albo None)
+    #blad nie przerywa optymalizacji - wynik dostaje tylko informacje o nim
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        return self.error
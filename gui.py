@@ -1,20 +1,40 @@
 import sys
-from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QLineEdit, QPushButton, QMessageBox, QDialog)
-from PyQt6.QtCore import Qt, QRect
-from PyQt6.QtGui import QPainter, QColor, QPen, QFont
+import numpy as np
+from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QLineEdit, QPushButton, QMessageBox, QDialog, QProgressBar, QComboBox, QSpinBox, QFileDialog)
+from PyQt6.QtCore import Qt, QRect, QThread, pyqtSignal
+from PyQt6.QtGui import QPainter, QColor, QPen, QFont, QImage
+from optimizer import iterate_optimization
+from masks import empty_mask, as_mask, load_mask, save_mask
+
+#filtr plikow w oknach wczytywania i zapisu maski
+MASK_FILE_FILTER = "Obrazy (*.png *.pbm *.bmp);;Wszystkie pliki (*)"
+
+
+#najwiekszy rozmiar siatki w edytorze - przy duzych maskach komorki sa mniejsze
+MAX_EDITOR_WIDTH = 1000
+MAX_EDITOR_HEIGHT = 800
+
+#kolory komorek: [dostepna, niedostepna] x [parzysta, nieparzysta] (szachownica)
+CELL_COLORS = np.array([
+    [QColor(144, 238, 144).rgb(), QColor(144-20, 238-20, 144-20).rgb()],
+    [QColor(255, 99, 71).rgb(), QColor(255-20, 99-20, 71-20).rgb()]
+], dtype=np.uint32)
 
 
 #edytor maski
 class MaskEditorWindow(QDialog):    
     #inicjalziacja
-    def __init__(self, gridWidth, gridHeight,):
+    def __init__(self, gridWidth, gridHeight, mask=None):
         super().__init__()
         self.gridWidth = gridWidth
         self.gridHeight = gridHeight
         self.cellSize = 40
         
-        #ustaw maske
-        self.mask = [[1] * gridWidth for _ in range(gridHeight)]
+        #ustaw maske - poprzednia, jezeli pasuje do rozmiaru siatki
+        if mask is not None and np.shape(mask) == (gridHeight, gridWidth):
+            self.mask = as_mask(mask)
+        else:
+            self.mask = empty_mask(gridWidth, gridHeight)
         
         self.setWindowTitle("Edytor maski - Zaznacz obszary niedostępne")
         self.setup_ui()
@@ -25,10 +45,31 @@ class MaskEditorWindow(QDialog):
         self.setLayout(layout)
         
         #instrukcje
-        instructions = QLabel("Kliknij na komórkę, aby przełączyć jej stan:\n")
+        instructions = QLabel(
+            "Kliknij lub przeciągnij, aby przełączyć stan komórek.\n"
+            "Prawy przycisk zawsze przywraca komórki dostępne.\n"
+        )
         instructions.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(instructions)
         
+        #narzedzia
+        toolLayout = QHBoxLayout()
+        
+        toolLayout.addWidget(QLabel("Narzędzie:"))
+        self.toolBox = QComboBox()
+        self.toolBox.addItem("Pędzel", 'brush')
+        self.toolBox.addItem("Prostokąt", 'rectangle')
+        self.toolBox.currentIndexChanged.connect(self.change_tool)
+        toolLayout.addWidget(self.toolBox)
+        
+        toolLayout.addWidget(QLabel("Rozmiar pędzla:"))
+        self.brushSizeBox = QSpinBox()
+        self.brushSizeBox.setRange(1, 50)
+        self.brushSizeBox.valueChanged.connect(self.change_brush_size)
+        toolLayout.addWidget(self.brushSizeBox)
+        
+        layout.addLayout(toolLayout)
+        
         #widget siatki
         self.gridWidget = MaskEditorGrid(self.mask, self.gridWidth, self.gridHeight, self.cellSize)
         layout.addWidget(self.gridWidget)
@@ -36,6 +77,14 @@ class MaskEditorWindow(QDialog):
         #guziki
         buttonLayout = QHBoxLayout()
         
+        importButton = QPushButton("Wczytaj z pliku...")
+        importButton.clicked.connect(self.import_mask)
+        buttonLayout.addWidget(importButton)
+        
+        exportButton = QPushButton("Zapisz do pliku...")
+        exportButton.clicked.connect(self.export_mask)
+        buttonLayout.addWidget(exportButton)
+        
         clearButton = QPushButton("Wyczyść maskę")
         clearButton.clicked.connect(self.clear_mask)
         buttonLayout.addWidget(clearButton)
@@ -46,11 +95,42 @@ class MaskEditorWindow(QDialog):
         
         layout.addLayout(buttonLayout)
     
+    def change_tool(self):
+        self.gridWidget.tool = self.toolBox.currentData()
+    
+    def change_brush_size(self, size):
+        self.gridWidget.brushSize = size
+    
     #czyszczenie maski
     def clear_mask(self):
-        self.mask = [[1] * self.gridWidth for _ in range(self.gridHeight)]
-        self.gridWidget.mask = self.mask
-        self.gridWidget.update()
+        self.mask[:] = 1
+        self.gridWidget.refresh(0, 0, self.gridWidth, self.gridHeight)
+    
+    #wczytanie maski z obrazka - rozmiar siatki bierze sie z obrazka
+    def import_mask(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Wczytaj maskę", "", MASK_FILE_FILTER)
+        if not path:
+            return
+        
+        try:
+            self.mask = load_mask(path)
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Błąd", f"Nie udało się wczytać maski:\n{error}")
+            return
+        
+        self.gridHeight, self.gridWidth = self.mask.shape
+        self.gridWidget.set_mask(self.mask)
+        self.adjustSize()
+    
+    def export_mask(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Zapisz maskę", "maska.png", MASK_FILE_FILTER)
+        if not path:
+            return
+        
+        try:
+            save_mask(self.mask, path)
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Błąd", f"Nie udało się zapisać maski:\n{error}")
     
     #zwracanie maski
     def get_mask(self):
@@ -58,58 +138,152 @@ class MaskEditorWindow(QDialog):
 
 
 #widget siatki
+#komorki sa trzymane w obrazku (piksel = komorka) wspoldzielacym pamiec z tablica numpy,
+#zmiana komorek przelicza tylko zmieniony fragment i odswieza tylko jego prostokat na ekranie
 class MaskEditorGrid(QWidget):    
     def __init__(self, mask, gridWidth, gridHeight, cellSize):
         super().__init__()
+        self.preferredCellSize = cellSize
+        self.tool = 'brush'
+        self.brushSize = 1
+        
+        #stan przeciagania: wartosc malowana, ostatnia komorka pedzla, poczatek i koniec prostokata
+        self.paintValue = None
+        self.lastCell = None
+        self.rectangleStart = None
+        self.rectangleEnd = None
+        
+        self.set_mask(mask)
+    
+    def set_mask(self, mask):
         self.mask = mask
-        self.gridWidth = gridWidth
-        self.gridHeight = gridHeight
-        self.cellSize = cellSize
+        self.gridHeight, self.gridWidth = mask.shape
+        self.cellSize = max(1, min(self.preferredCellSize, MAX_EDITOR_WIDTH // self.gridWidth, MAX_EDITOR_HEIGHT // self.gridHeight))
+        
+        rows, cols = np.indices(mask.shape)
+        self.parity = ((rows + cols) % 2).astype(np.intp)
+        self.pixels = np.empty(mask.shape, dtype=np.uint32)
+        self.image = QImage(self.pixels.data, self.gridWidth, self.gridHeight, self.gridWidth * 4, QImage.Format.Format_RGB32)
+        self.refresh(0, 0, self.gridWidth, self.gridHeight)
         
         self.setMinimumSize(
-            gridWidth * cellSize + 1,
-            gridHeight * cellSize + 1
+            self.gridWidth * self.cellSize + 1,
+            self.gridHeight * self.cellSize + 1
         )
+        self.updateGeometry()
+    
+    #przelicz kolory komorek w prostokacie (kolumna, wiersz, szerokosc, wysokosc) i odswiez go na ekranie
+    def refresh(self, x, y, w, h):
+        blocked = self.mask[y:y + h, x:x + w] == 0
+        self.pixels[y:y + h, x:x + w] = CELL_COLORS[blocked.astype(np.intp), self.parity[y:y + h, x:x + w]]
+        self.update(QRect(x * self.cellSize, y * self.cellSize, w * self.cellSize, h * self.cellSize))
     
     def paintEvent(self, event):
         #inicjalizacja paintera
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         
-        #rysowanie komorek
-        for i in range(self.gridHeight):
-            for j in range(self.gridWidth):
-                x = j * self.cellSize
-                y = i * self.cellSize
-                
-                #kolor zalezny od stanu maski
-                if self.mask[i][j] == 1:
-                    if (i+j)%2 == 0:
-                        color = QColor(144, 238, 144)
-                    else:
-                        color = QColor(144-20, 238-20, 144-20)
-                else:
-                    if (i+j)%2 == 0:
-                        color = QColor(255, 99, 71) 
-                    else:
-                        color = QColor(255-20, 99-20, 71-20)
-                
-                painter.setPen(Qt.PenStyle.NoPen)
-                painter.setBrush(color)
-                painter.drawRect(x, y, self.cellSize, self.cellSize)
+        #rysowane sa tylko komorki w odswiezanym obszarze
+        area = event.rect()
+        left = area.left() // self.cellSize
+        top = area.top() // self.cellSize
+        right = min(self.gridWidth, area.right() // self.cellSize + 1)
+        bottom = min(self.gridHeight, area.bottom() // self.cellSize + 1)
+        if left < right and top < bottom:
+            painter.drawImage(
+                QRect(left * self.cellSize, top * self.cellSize, (right - left) * self.cellSize, (bottom - top) * self.cellSize),
+                self.image,
+                QRect(left, top, right - left, bottom - top)
+            )
         
+        #podglad prostokata w trakcie przeciagania
+        if self.rectangleStart is not None:
+            painter.setPen(QPen(QColor(0, 0, 0), 2, Qt.PenStyle.DashLine))
+            painter.setBrush(Qt.BrushStyle.NoBrush)
+            painter.drawRect(self.rectangle_area())
+    
+    def cell_at(self, event):
+        x = int(event.position().x()) // self.cellSize
+        y = int(event.position().y()) // self.cellSize
+        return x, y
+    
+    #prostokat zaznaczenia w pikselach widgetu
+    def rectangle_area(self):
+        (x1, y1), (x2, y2) = self.rectangleStart, self.rectangleEnd
+        left, right = sorted((x1, x2))
+        top, bottom = sorted((y1, y2))
+        return QRect(left * self.cellSize, top * self.cellSize, (right - left + 1) * self.cellSize, (bottom - top + 1) * self.cellSize)
+    
+    #ustaw wartosc w prostokacie komorek (przyciety do siatki)
+    def fill(self, x1, y1, x2, y2, value):
+        left, right = max(0, min(x1, x2)), min(self.gridWidth - 1, max(x1, x2))
+        top, bottom = max(0, min(y1, y2)), min(self.gridHeight - 1, max(y1, y2))
+        if left > right or top > bottom:
+            return
+        self.mask[top:bottom + 1, left:right + 1] = value
+        self.refresh(left, top, right - left + 1, bottom - top + 1)
+    
+    #kwadratowy pedzel na komorce (x, y)
+    def stamp(self, x, y):
+        offset = (self.brushSize - 1) // 2
+        self.fill(x - offset, y - offset, x - offset + self.brushSize - 1, y - offset + self.brushSize - 1, self.paintValue)
+    
+    #pedzel wzdluz odcinka od ostatniej komorki, zeby szybki ruch myszy nie zostawial dziur
+    def stroke(self, x, y):
+        lastX, lastY = self.lastCell
+        steps = max(abs(x - lastX), abs(y - lastY))
+        for step in range(1, steps + 1):
+            self.stamp(lastX + round((x - lastX) * step / steps), lastY + round((y - lastY) * step / steps))
+        self.lastCell = (x, y)
+    
     def mousePressEvent(self, event):
-        x = event.pos().x() // self.cellSize
-        y = event.pos().y() // self.cellSize
+        x, y = self.cell_at(event)
         
         #wykonac akcje tylko jezeli kliknieto na komorke
-        if 0 <= x < self.gridWidth and 0 <= y < self.gridHeight:
-            if self.mask[y][x] == 1:
-                self.mask[y][x] = 0
-            else:
-                self.mask[y][x] = 1
-            #self.mask[y][x] = 1 - self.mask[y][x]
-            self.update()
+        if not (0 <= x < self.gridWidth and 0 <= y < self.gridHeight):
+            return
+        
+        #lewy przycisk przelacza stan kliknietej komorki i maluje tym stanem, prawy zawsze czysci
+        if event.button() == Qt.MouseButton.RightButton:
+            self.paintValue = 1
+        else:
+            self.paintValue = 1 - int(self.mask[y, x])
+        
+        if self.tool == 'rectangle':
+            self.rectangleStart = self.rectangleEnd = (x, y)
+            self.update(self.rectangle_area().adjusted(-2, -2, 2, 2))
+        else:
+            self.lastCell = (x, y)
+            self.stamp(x, y)
+    
+    def mouseMoveEvent(self, event):
+        if self.paintValue is None:
+            return
+        
+        x, y = self.cell_at(event)
+        x = min(max(x, 0), self.gridWidth - 1)
+        y = min(max(y, 0), self.gridHeight - 1)
+        
+        if self.rectangleStart is not None:
+            if (x, y) != self.rectangleEnd:
+                #odswiez stary i nowy podglad
+                self.update(self.rectangle_area().adjusted(-2, -2, 2, 2))
+                self.rectangleEnd = (x, y)
+                self.update(self.rectangle_area().adjusted(-2, -2, 2, 2))
+        elif (x, y) != self.lastCell:
+            self.stroke(x, y)
+    
+    def mouseReleaseEvent(self, event):
+        if self.rectangleStart is not None:
+            x, y = self.cell_at(event)
+            self.rectangleEnd = (min(max(x, 0), self.gridWidth - 1), min(max(y, 0), self.gridHeight - 1))
+            area = self.rectangle_area()
+            (x1, y1), (x2, y2) = self.rectangleStart, self.rectangleEnd
+            self.rectangleStart = self.rectangleEnd = None
+            self.fill(x1, y1, x2, y2, self.paintValue)
+            self.update(area.adjusted(-2, -2, 2, 2))
+        
+        self.paintValue = None
+        self.lastCell = None
 
 
 class ParameterWindow(QDialog):    
@@ -132,7 +306,7 @@ class ParameterWindow(QDialog):
         }
         
         #maska domyslnie wszystkie dostepne
-        self.mask = [[1] * self.defaults['gridWidth'] for _ in range(self.defaults['gridHeight'])]
+        self.mask = empty_mask(self.defaults['gridWidth'], self.defaults['gridHeight'])
         
         self.setWindowTitle("Optymalizacja pakowania pudełek - Parametry")
         self.setup_ui()
@@ -175,7 +349,7 @@ class ParameterWindow(QDialog):
         formLayout.addRow("  Min Wysokość siatki:", self.inputs['minBoxHeight'])
         self.inputs['maxBoxHeight'] = QLineEdit(str(self.defaults['maxBoxHeight']))
         formLayout.addRow("  Max Wysokość siatki:", self.inputs['maxBoxHeight'])
-
+        
         #parametry algorytmu
         formLayout.addRow(QLabel(""))  #przerwa
         formLayout.addRow(QLabel("Parametry algorytmu:"))
@@ -211,14 +385,18 @@ class ParameterWindow(QDialog):
             gridHeight = int(self.inputs['gridHeight'].text())
             
             #odpalaj edytor
-            editor = MaskEditorWindow(gridWidth, gridHeight)
+            editor = MaskEditorWindow(gridWidth, gridHeight, self.mask)
             if editor.exec():
                 self.mask = editor.get_mask()
+                
+                #wczytana maska moze miec inny rozmiar niz siatka w formularzu
+                self.inputs['gridWidth'].setText(str(editor.gridWidth))
+                self.inputs['gridHeight'].setText(str(editor.gridHeight))
     
     def accept_input(self):
         self.get_parameters()
         self.accept()
-    
+
 #funkcja pobiera wartosci
     def get_parameters(self):
         params = {}
@@ -239,3 +417,105 @@ class ParameterWindow(QDialog):
         
         return params
 
+
+#optymalizacja w osobnym watku, zeby okno nie zamarzalo
+class OptimizationWorker(QThread):
+    progress = pyqtSignal(dict)
+    resultReady = pyqtSignal(dict)
+    #opis bledu - nieobsluzony wyjatek w QThread.run zamyka cala aplikacje
+    error = pyqtSignal(str)
+    
+    def __init__(self, boxes, params):
+        super().__init__()
+        self.boxes = boxes
+        self.params = params
+        self.cancelled = False
+    
+    def run(self):
+        try:
+            self.optimize()
+        except Exception as error:
+            self.error.emit(f"{type(error).__name__}: {error}")
+    
+    def optimize(self):
+        params = self.params
+        steps = iterate_optimization(
+            self.boxes, params['mask'], params['gridWidth'], params['gridHeight'],
+            params['generations'], params['populationSize'], params['mutationRate'],
+            stop=lambda: self.cancelled
+        )
+        
+        #statystyki po kazdym pokoleniu, wynik na koncu
+        while True:
+            try:
+                stats = next(steps)
+            except StopIteration as stop:
+                self.resultReady.emit(stop.value)
+                return
+            self.progress.emit(stats)
+    
+    #zatrzymanie po biezacym pokoleniu - wynik zawiera najlepszego do tej pory
+    def cancel(self):
+        self.cancelled = True
+
+
+#okno postepu optymalizacji z przyciskiem anuluj
+class ProgressWindow(QDialog):
+    def __init__(self, boxes, params):
+        super().__init__()
+        self.params = params
+        self.optimizationResult = None
+        
+        self.setWindowTitle("Optymalizacja w toku")
+        self.setup_ui()
+        
+        self.worker = OptimizationWorker(boxes, params)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.resultReady.connect(self.finish)
+        self.worker.error.connect(self.fail)
+        self.worker.start()
+    
+    def setup_ui(self):
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        
+        self.progressBar = QProgressBar()
+        self.progressBar.setRange(0, self.params['generations'])
+        self.progressBar.setValue(0)
+        layout.addWidget(self.progressBar)
+        
+        self.statsLabel = QLabel("Ocena pierwszego pokolenia...")
+        layout.addWidget(self.statsLabel)
+        
+        self.cancelButton = QPushButton("Anuluj")
+        self.cancelButton.clicked.connect(self.cancel)
+        layout.addWidget(self.cancelButton)
+    
+    def show_progress(self, stats):
+        self.progressBar.setValue(stats['generation'])
+        self.statsLabel.setText(
+            f"Pokolenie {stats['generation']} / {stats['generations']}\n"
+            f"Najlepszy: {stats['bestScore']}   Średni: {stats['meanScore']:.1f}   Najgorszy: {stats['worstScore']}\n"
+            f"Najlepszy dotychczas: {stats['bestSoFar']} pudełek\n"
+            f"Czas: {stats['elapsed']:.1f} s"
+        )
+    
+    def cancel(self):
+        self.worker.cancel()
+        self.cancelButton.setEnabled(False)
+        self.cancelButton.setText("Anulowanie...")
+    
+    #zamkniecie okna (X) dziala jak anuluj - okno zamyka sie dopiero z wynikiem
+    def reject(self):
+        self.cancel()
+    
+    def finish(self, result):
+        self.worker.wait()
+        self.optimizationResult = result
+        self.accept()
+    
+    #blad optymalizacji - komunikat i zamkniecie okna bez wyniku (optimizationResult = None)
+    def fail(self, message):
+        self.worker.wait()
+        QMessageBox.critical(self, "Błąd", f"Optymalizacja nie powiodła się:\n{message}")
+        self.done(QDialog.DialogCode.Rejected)
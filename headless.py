@@ -0,0 +1,166 @@
+import argparse
+import json
+import sys
+import time
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from optimizer import iterate_optimization, iterate_containers, run_to_end
+from main import generate_boxes
+
+
+#uruchamianie optymalizacji bez okien (bez PyQt6)
+#zadania w JSON (obiekt albo lista) lub JSONL (jedno zadanie w linii), z pliku albo ze stdin
+#na wyjscie jedna linia JSON na zadanie: wynik, rozmieszczenie i czasy
+#
+#przyklad zadania:
+#{"id": "paleta-1", "seed": 44, "gridWidth": 16, "gridHeight": 16, "boxCount": 150,
+# "minBoxWidth": 1, "maxBoxWidth": 5, "minBoxHeight": 1, "maxBoxHeight": 5,
+# "generations": 10, "populationSize": 50, "mutationRate": 0.5}
+#zamiast parametrow generatora mozna podac "boxes": [[w, h], ...], a maske jako "mask": [[1, 0, ...], ...]
+#kilka pojemnikow: "containers": [{"width": 16, "height": 16, "mask": [[...]]}, ...] (maska opcjonalna),
+#wtedy "placement" to lista rozmieszczen, po jednym na pojemnik
+
+#wartosci domyslne takie same jak w oknie parametrow
+DEFAULT_JOB = {
+    'seed': 44,
+    'gridWidth': 16,
+    'gridHeight': 16,
+    'minBoxWidth': 1,
+    'maxBoxWidth': 5,
+    'minBoxHeight': 1,
+    'maxBoxHeight': 5,
+    'generations': 10,
+    'populationSize': 50,
+    'mutationRate': 0.5,
+    'boxCount': 150
+}
+
+#dodatkowe opcje run_optimization, ktore mozna ustawic w zadaniu
+OPTIMIZER_OPTIONS = ('decoder', 'prefixCacheBytes', 'fitnessCacheSize', 'workers', 'breeding', 'lockstep', 'stagnation', 'convergence', 'timeBudget', 'profile', 'checkpoint', 'checkpointInterval', 'resume', 'seeding', 'seedFraction', 'polish', 'racing')
+
+
+def read_jobs(text):
+    text = text.strip()
+    if not text:
+        return []
+    
+    try:
+        jobs = json.loads(text)
+    except json.JSONDecodeError:
+        #JSONL - kazda niepusta linia to osobne zadanie
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    
+    return jobs if isinstance(jobs, list) else [jobs]
+
+
+#parametry zadania z wartosciami domyslnymi, pudelka i maska
+def prepare_job(job):
+    params = dict(DEFAULT_JOB)
+    params.update(job)
+    
+    #tak samo jak w main.py - ten sam seed daje ten sam wynik co w oknie
+    random.seed(params['seed'])
+    if 'boxes' in params:
+        boxes = [tuple(box) for box in params['boxes']]
+    else:
+        boxes = generate_boxes(params['boxCount'], params['minBoxWidth'], params['maxBoxWidth'], params['minBoxHeight'], params['maxBoxHeight'])
+    
+    mask = params.get('mask')
+    if mask is None:
+        mask = [[1] * params['gridWidth'] for _ in range(params['gridHeight'])]
+    return params, boxes, mask
+
+
+#progress(stats) - opcjonalnie wywolywane po kazdym pokoleniu (service.py)
+def run_job(index, job, progress=None):
+    startTime = time.time()
+    params, boxes, mask = prepare_job(job)
+    
+    options = {name: params[name] for name in OPTIMIZER_OPTIONS if name in params}
+    if 'containers' in params:
+        containers = [(container['width'], container['height'], container.get('mask')) for container in params['containers']]
+        steps = iterate_containers(boxes, containers, params['generations'], params['populationSize'], params['mutationRate'], **options)
+    else:
+        steps = iterate_optimization(boxes, mask, params['gridWidth'], params['gridHeight'], params['generations'], params['populationSize'], params['mutationRate'], **options)
+    result = run_to_end(steps, progress)
+    
+    if 'containers' in params:
+        placement = [placement_json(containerPlacement) for containerPlacement in result['bestPlacement']]
+    else:
+        placement = placement_json(result['bestPlacement'])
+    
+    output = {
+        'id': job.get('id', index),
+        'index': index,
+        'seed': params['seed'],
+        'boxCount': len(boxes),
+        'bestScore': result['bestScore'],
+        'worstScore': result['worstScore'],
+        'firstGenBestScore': result['firstGenBestScore'],
+        'firstGenWorstScore': result['firstGenWorstScore'],
+        'placement': placement,
+        'executionTime': result['executionTime'],
+        'wallTime': time.time() - startTime,
+        'generationsRun': result['generationsRun'],
+        'stopReason': result['stopReason'],
+        'cacheHits': result['cacheHits'],
+        'cacheMisses': result['cacheMisses']
+    }
+    if 'containers' in result:
+        output['containers'] = result['containers']
+    if 'profile' in result:
+        output['profile'] = result['profile']
+    return output
+
+
+def placement_json(placement):
+    return [[boxId, idx, list(corner), list(size)] for boxId, idx, corner, size in placement]
+
+
+#bledne zadanie nie zatrzymuje pozostalych - dostaje linie z polem "error"
+def run_job_safe(index, job):
+    try:
+        return run_job(index, job)
+    except Exception as error:
+        jobId = job.get('id', index) if isinstance(job, dict) else index
+        return {'id': jobId, 'index': index, 'error': f"{type(error).__name__}: {error}"}
+
+
+#wyniki w kolejnosci konczenia sie zadan; przy concurrency <= 1 po kolei
+def run_jobs(jobs, concurrency=1):
+    if concurrency <= 1:
+        for index, job in enumerate(jobs):
+            yield run_job_safe(index, job)
+        return
+    
+    with ProcessPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_job_safe, index, job) for index, job in enumerate(jobs)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optymalizacja pakowania pudełek bez GUI")
+    parser.add_argument('files', nargs='*', help="pliki JSON/JSONL z zadaniami (brak albo '-' = stdin)")
+    parser.add_argument('-j', '--concurrency', type=int, default=1, help="ile zadan naraz (osobne procesy)")
+    args = parser.parse_args(argv)
+    
+    jobs = []
+    for path in args.files or ['-']:
+        if path == '-':
+            jobs.extend(read_jobs(sys.stdin.read()))
+        else:
+            with open(path, encoding='utf-8') as jobFile:
+                jobs.extend(read_jobs(jobFile.read()))
+    
+    failed = False
+    for result in run_jobs(jobs, args.concurrency):
+        failed = failed or 'error' in result
+        print(json.dumps(result), flush=True)
+    
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,5 @@
 import sys
 import random
-from PyQt6.QtWidgets import QApplication
-from optimizer import run_optimization, evaluate
-from visualizer import show_solution
-from gui import ParameterWindow
 
 
 def generate_boxes(count, minWidth, maxWidth, minHeight, maxHeight):
@@ -11,6 +7,11 @@ def generate_boxes(count, minWidth, maxWidth, minHeight, maxHeight):
 
 
 if __name__ == "__main__":
+    #Qt dopiero tutaj - generate_boxes mozna importowac bez PyQt6 (headless.py)
+    from PyQt6.QtWidgets import QApplication
+    from visualizer import show_solution
+    from gui import ParameterWindow, ProgressWindow
+    
     #inicjalizuj aplikacje
     app = QApplication(sys.argv)
     
@@ -41,12 +42,18 @@ if __name__ == "__main__":
         print("============================================================")
         print()
         
-        #odpalaj optymalizacje Start the event loop
-        result = run_optimization(boxes, params['mask'], params['gridWidth'], params['gridHeight'], params['generations'], params['populationSize'], params['mutationRate'])
+        #optymalizacja w osobnym watku, okno postepu z przyciskiem anuluj
+        progressDialog = ProgressWindow(boxes, params)
+        progressDialog.exec()
+        result = progressDialog.optimizationResult
+        
+        #optymalizacja sie nie udala - blad byl juz pokazany w oknie postepu
+        if result is None:
+            sys.exit(1)
         
-        #oblicz najlepszego i najgorszego
-        bestScore, bestPlacement = evaluate(result['bestIndividual'], params['mask'], boxes, params['gridWidth'], params['gridHeight'])
-        worstScore, _ = evaluate(result['worstIndividual'], params['mask'], boxes, params['gridWidth'], params['gridHeight'])
+        #najlepszy i najgorszy sa juz policzeni w trakcie optymalizacji
+        bestScore, bestPlacement = result['bestScore'], result['bestPlacement']
+        worstScore = result['worstScore']
         
         #wyswietl wyniki w konsoli
         print("============================================================")
@@ -64,6 +71,7 @@ if __name__ == "__main__":
         print(f"  Najlepszy:           +{bestScore - result['firstGenBestScore']} pudełek")
         print(f"  Najgorszy:          +{worstScore - result['firstGenWorstScore']} pudełek")
         print()
+        print(f"Pokolenia wykonane: {result['generationsRun']} ({result['stopReason']})")
         print(f"Execution time:   {result['executionTime']:.3f} seconds")
         print("============================================================")
         
@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+
+
+#maska jako tablica numpy uint8 (wiersz, kolumna): 1 - komorka dostepna, 0 - niedostepna
+#zapis i odczyt masek jako obrazkow: czarny piksel = komorka niedostepna, bialy = dostepna
+#PBM (P1 i P4) czytany i zapisywany bez Qt, inne formaty (PNG, BMP...) przez QImage
+
+
+def empty_mask(width, height):
+    return np.ones((height, width), dtype=np.uint8)
+
+
+def as_mask(mask):
+    return (np.asarray(mask) != 0).astype(np.uint8)
+
+
+def load_mask(path):
+    if os.path.splitext(path)[1].lower() in ('.pbm', '.pnm'):
+        with open(path, 'rb') as maskFile:
+            return read_pbm(maskFile.read())
+    return load_image_mask(path)
+
+
+def save_mask(mask, path):
+    if os.path.splitext(path)[1].lower() in ('.pbm', '.pnm'):
+        with open(path, 'wb') as maskFile:
+            maskFile.write(write_pbm(mask))
+    else:
+        save_image_mask(mask, path)
+
+
+#kolejne slowa naglowka PBM (komentarze od '#' do konca linii) i pozycja zaraz za ostatnim
+def pbm_header(data, count):
+    tokens = []
+    position = 0
+    while len(tokens) < count:
+        while position < len(data) and (data[position:position + 1].isspace() or data[position:position + 1] == b'#'):
+            if data[position:position + 1] == b'#':
+                position = data.find(b'\n', position)
+                if position < 0:
+                    raise ValueError("Niepełny nagłówek PBM")
+            position += 1
+        start = position
+        while position < len(data) and not data[position:position + 1].isspace() and data[position:position + 1] != b'#':
+            position += 1
+        if start == position:
+            raise ValueError("Niepełny nagłówek PBM")
+        tokens.append(data[start:position])
+    return tokens, position
+
+
+def read_pbm(data):
+    (magic, width, height), position = pbm_header(data, 3)
+    width, height = int(width), int(height)
+    
+    if magic == b'P4':
+        #jeden bialy znak po naglowku, potem wiersze bitow dopelnione do pelnych bajtow
+        rowBytes = (width + 7) // 8
+        bits = np.frombuffer(data, dtype=np.uint8, count=rowBytes * height, offset=position + 1)
+        pixels = np.unpackbits(bits.reshape(height, rowBytes), axis=1)[:, :width]
+    elif magic == b'P1':
+        digits = np.frombuffer(data[position:], dtype=np.uint8)
+        digits = digits[(digits == ord('0')) | (digits == ord('1'))]
+        if len(digits) < width * height:
+            raise ValueError("Za mało pikseli w pliku PBM")
+        pixels = (digits[:width * height] - ord('0')).reshape(height, width)
+    else:
+        raise ValueError(f"Nieobsługiwany format PBM: {magic.decode(errors='replace')}")
+    
+    #w PBM 1 to czarny piksel
+    return (pixels == 0).astype(np.uint8)
+
+
+def write_pbm(mask):
+    mask = as_mask(mask)
+    height, width = mask.shape
+    bits = np.packbits(mask == 0, axis=1)
+    return f"P4\n{width} {height}\n".encode() + bits.tobytes()
+
+
+#Qt importowane dopiero tutaj, zeby PBM dzialal tez bez PyQt6
+def load_image_mask(path):
+    from PyQt6.QtGui import QImage
+    
+    image = QImage(path)
+    if image.isNull():
+        raise ValueError(f"Nie można wczytać obrazka: {path}")
+    
+    image = image.convertToFormat(QImage.Format.Format_Grayscale8)
+    width, height = image.width(), image.height()
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(bits, dtype=np.uint8).reshape(height, image.bytesPerLine())[:, :width]
+    return (pixels >= 128).astype(np.uint8)
+
+
+def save_image_mask(mask, path):
+    from PyQt6.QtGui import QImage
+    
+    pixels = np.ascontiguousarray(as_mask(mask) * np.uint8(255))
+    height, width = pixels.shape
+    image = QImage(pixels.data, width, height, width, QImage.Format.Format_Grayscale8)
+    if not image.save(path):
+        raise ValueError(f"Nie można zapisać obrazka: {path}")
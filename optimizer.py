@@ -1,5 +1,19 @@
+import bisect
+import heapq
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
 import random
 import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from profiler import Profiler
+from checkpoint import CheckpointWriter, load_checkpoint
 
 
 def can_place(grid, x, y, w, h, mask):
@@ -23,6 +37,638 @@ def place(grid, x, y, w, h, boxId):
             grid[x + i][y + j] = boxId
 
 
+#tablica sum prefiksowych (summed-area table) dla tablicy 0/1
+#sat[a][b] = suma komorek w prostokacie [0, a) x [0, b)
+def summed_area(cells):
+    height, width = cells.shape
+    sat = np.zeros((height + 1, width + 1), dtype=np.int32)
+    sat[1:, 1:] = cells.cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+    return sat
+
+
+#suma w oknie w x h dla kazdej pozycji naraz - 4 odczyty z tablicy na pozycje
+#dziala tez dla stosu tablic (..., wysokosc + 1, szerokosc + 1)
+def window_sums(sat, w, h):
+    rows = sat.shape[-2] - h
+    cols = sat.shape[-1] - w
+    return sat[..., h:, w:] - sat[..., :rows, w:] - sat[..., h:, :cols] + sat[..., :rows, :cols]
+
+
+#lista pozycji tylko wtedy, gdy maska dopuszcza najwyzej 1 / SPARSE_ANCHORS pozycji ksztaltu
+SPARSE_ANCHORS = 8
+
+
+#pozycje dozwolone przez maske dla jednego ksztaltu (w, h), w jednej z trzech postaci:
+#  - dense, allowed None - maska nie blokuje zadnej pozycji, wystarczy okno na calej siatce
+#  - dense, allowed - okno na calej siatce i mapa bitowa dozwolonych pozycji (np.packbits, 1 bit na pozycje)
+#  - lista - malo dozwolonych pozycji (mocno zablokowana maska): posortowane wierszami indeksy
+#    lewego gornego rogu okna w splaszczonej tablicy sum prefiksowych (4 bajty na pozycje)
+class ShapeAnchors:
+    def __init__(self, maskSat, w, h):
+        height = maskSat.shape[0] - 1
+        width = maskSat.shape[1] - 1
+        self.rowsCount = height - h + 1
+        self.colsCount = width - w + 1
+        self.dense = False
+        self.allowed = None
+        
+        if self.rowsCount <= 0 or self.colsCount <= 0:
+            self.count = 0
+            return
+        
+        size = self.rowsCount * self.colsCount
+        #maska bez przeszkod - okna nie trzeba liczyc
+        if maskSat[-1, -1] == 0:
+            self.count = size
+            self.dense = True
+            return
+        
+        allowed = window_sums(maskSat, w, h) == 0
+        self.count = int(np.count_nonzero(allowed))
+        if self.count == 0:
+            return
+        
+        if self.count * SPARSE_ANCHORS > size:
+            self.dense = True
+            if self.count < size:
+                self.allowed = np.packbits(allowed)
+            return
+        
+        rows, cols = np.nonzero(allowed)
+        self.stride = width + 1
+        self.topLeft = (rows * self.stride + cols).astype(np.int32)
+        #przesuniecia pozostalych rogow okna wzgledem lewego gornego
+        self.offsets = (h * self.stride + w, w, h * self.stride)
+    
+    #mapa dozwolonych pozycji (splaszczona) do polaczenia z wolnymi oknami
+    def allowed_cells(self):
+        return np.unpackbits(self.allowed, count=self.rowsCount * self.colsCount).view(bool)
+    
+    #sumy okien w dozwolonych pozycjach listy; flat to splaszczona tablica sum albo ich stos (P, ...)
+    def window_sums(self, flat):
+        a, b, c = self.offsets
+        topLeft = self.topLeft
+        return flat[..., a:][..., topLeft] - flat[..., b:][..., topLeft] - flat[..., c:][..., topLeft] + flat[..., topLeft]
+    
+    #(wiersz, kolumna) dla numeru pozycji z listy (albo tablic numerow)
+    def position(self, k):
+        return np.divmod(self.topLeft[k], self.stride)
+
+
+#indeks pozycji dozwolonych przez maske, liczony raz na cale uruchomienie
+#maska sie nie zmienia, wiec evaluate sprawdza juz tylko zajetosc
+#ksztalty sa dodawane przy pierwszym uzyciu (anchors), shapes - ksztalty liczone od razu
+class MaskIndex:
+    def __init__(self, mask, width, height, shapes=()):
+        self.mask = mask
+        self.width = width
+        self.height = height
+        self.freeRects = None
+        
+        #maska mniejsza niz siatka - pozycje i zajetosc mialyby rozne wymiary
+        maskArray = np.asarray(mask)
+        if maskArray.ndim != 2 or maskArray.shape[0] < height or maskArray.shape[1] < width:
+            raise ValueError(f"Maska ({'x'.join(map(str, maskArray.shape[::-1]))}) jest mniejsza niż siatka ({width}x{height})")
+        self.maskSat = summed_area(maskArray[:height, :width] == 0)
+        #komorki dostepne w masce - do przycinania w evaluate
+        self.freeCells = width * height - int(self.maskSat[-1, -1])
+        
+        self.shapes = {}
+        for w, h in shapes:
+            self.anchors(w, h)
+    
+    def anchors(self, w, h):
+        shape = self.shapes.get((w, h))
+        if shape is None:
+            shape = ShapeAnchors(self.maskSat, w, h)
+            self.shapes[(w, h)] = shape
+        return shape
+    
+    #liczba dozwolonych pozycji bez budowania indeksu ksztaltu
+    def anchor_count(self, w, h):
+        shape = self.shapes.get((w, h))
+        if shape is not None:
+            return shape.count
+        if w > self.width or h > self.height:
+            return 0
+        return int(np.count_nonzero(window_sums(self.maskSat, w, h) == 0))
+    
+    #maksymalne wolne prostokaty samej maski (dla FreeRectangles), liczone przy pierwszym uzyciu
+    def free_rectangles(self):
+        if self.freeRects is None:
+            rects = [(0, 0, self.height, self.width)] if self.width > 0 and self.height > 0 else []
+            
+            #kazdy ciag zablokowanych komorek w wierszu traktowany jak przeszkoda 1 x n
+            blocked = np.asarray(self.mask)[:self.height, :self.width] == 0
+            for i in range(self.height):
+                row = np.concatenate(([False], blocked[i], [False]))
+                edges = np.flatnonzero(row[1:] != row[:-1])
+                for start, end in zip(edges[::2], edges[1::2]):
+                    rects = split_free_rectangles(rects, i, int(start), int(end - start), 1)
+            
+            self.freeRects = rects
+        return self.freeRects
+
+
+#wszystkie ksztalty pudelek razem z obroconymi
+def box_shapes(boxes):
+    shapes = set()
+    for w, h in boxes:
+        shapes.add((w, h))
+        shapes.add((h, w))
+    return shapes
+
+
+def build_mask_index(mask, boxes, width, height):
+    return MaskIndex(mask, width, height, box_shapes(boxes))
+
+
+#siatka zajetosci - tablica sum prefiksowych samych postawionych pudelek
+#maske obsluguje MaskIndex
+class OccupancyGrid:
+    def __init__(self, maskIndex):
+        self.maskIndex = maskIndex
+        self.width = maskIndex.width
+        self.height = maskIndex.height
+        self.sat = np.zeros((self.height + 1, self.width + 1), dtype=np.int32)
+        
+        #zakresy do aktualizacji tablicy po postawieniu pudelka
+        self.rowRange = np.arange(self.height + 1, dtype=np.int32)
+        self.colRange = np.arange(self.width + 1, dtype=np.int32)
+    
+    #pierwsza pozycja (wiersz, kolumna) w kolejnosci od lewej do prawej, od gory do dolu
+    #taka sama jak przy skanowaniu can_place, ale sprawdzane sa tylko pozycje dozwolone przez maske
+    def find(self, w, h):
+        anchors = self.maskIndex.anchors(w, h)
+        if anchors.count == 0:
+            return None
+        
+        if anchors.dense:
+            free = (window_sums(self.sat, w, h) == 0).ravel()
+            if anchors.allowed is not None:
+                free &= anchors.allowed_cells()
+            k = int(free.argmax())
+            if not free[k]:
+                return None
+            return divmod(k, anchors.colsCount)
+        
+        free = anchors.window_sums(self.sat.ravel()) == 0
+        k = int(free.argmax())
+        if not free[k]:
+            return None
+        row, col = anchors.position(k)
+        return int(row), int(col)
+    
+    #find dla profilera: (pozycja, sprawdzone pozycje, odczytane komorki tablicy sum)
+    #wszystkie dozwolone pozycje sa liczone naraz, kazda to 4 odczyty
+    def find_counted(self, w, h):
+        anchors = self.maskIndex.anchors(w, h)
+        candidates = anchors.rowsCount * anchors.colsCount if anchors.dense else anchors.count
+        return self.find(w, h), candidates, 4 * candidates
+    
+    def place(self, x, y, w, h):
+        #pudelko doklada min(max(a-x, 0), h) * min(max(b-y, 0), w) do sat[a][b]
+        rows = np.minimum(np.maximum(self.rowRange - x, 0), h)
+        cols = np.minimum(np.maximum(self.colRange - y, 0), w)
+        #nowa tablica zamiast zmiany w miejscu - migawki moga ja wspoldzielic bez kopiowania
+        self.sat = self.sat + np.outer(rows, cols)
+    
+    #stan dekodera do PrefixCache: (stan, rozmiar w bajtach)
+    def snapshot(self):
+        return self.sat, self.sat.nbytes
+    
+    def restore(self, state):
+        self.sat = state
+
+
+#usuwa prostokat pudelka z listy maksymalnych wolnych prostokatow (posortowanej po (gora, lewo))
+def split_free_rectangles(rects, x, y, w, h):
+    bottom = x + h
+    right = y + w
+    
+    kept = []
+    pieces = set()
+    for rect in rects:
+        rectTop, rectLeft, rectBottom, rectRight = rect
+        if rectTop >= bottom or x >= rectBottom or rectLeft >= right or y >= rectRight:
+            kept.append(rect)
+            continue
+        
+        #z prostokata nachodzacego na pudelko zostaja maksymalnie 4 kawalki dookola niego
+        if rectTop < x:
+            pieces.add((rectTop, rectLeft, x, rectRight))
+        if bottom < rectBottom:
+            pieces.add((bottom, rectLeft, rectBottom, rectRight))
+        if rectLeft < y:
+            pieces.add((rectTop, rectLeft, rectBottom, y))
+        if right < rectRight:
+            pieces.add((rectTop, right, rectBottom, rectRight))
+    
+    #kawalki zawarte w innym prostokacie nie sa maksymalne
+    others = kept + list(pieces)
+    for piece in pieces:
+        top, left, pieceBottom, pieceRight = piece
+        contained = False
+        for other in others:
+            if other is not piece and other[0] <= top and other[1] <= left and pieceBottom <= other[2] and pieceRight <= other[3]:
+                contained = True
+                break
+        if not contained:
+            bisect.insort(kept, piece)
+    
+    return kept
+
+
+#referencyjny dekoder - pelne skanowanie siatki z uzyciem can_place
+class ScanGrid:
+    def __init__(self, maskIndex):
+        self.mask = maskIndex.mask
+        self.width = maskIndex.width
+        self.height = maskIndex.height
+        self.grid = [[0] * self.width for _ in range(self.height)]
+    
+    def find(self, w, h):
+        for i in range(self.height):
+            for j in range(self.width):
+                if can_place(self.grid, i, j, w, h, self.mask):
+                    return (i, j)
+        return None
+    
+    #find dla profilera - to samo skanowanie, z liczeniem komorek sprawdzonych przez can_place
+    def find_counted(self, w, h):
+        candidates = 0
+        cells = 0
+        for i in range(self.height):
+            for j in range(self.width):
+                candidates += 1
+                if i + h > self.height or j + w > self.width:
+                    continue
+                
+                fits = True
+                for a in range(h):
+                    for b in range(w):
+                        cells += 1
+                        if self.grid[i + a][j + b] != 0 or self.mask[i + a][j + b] == 0:
+                            fits = False
+                            break
+                    if not fits:
+                        break
+                if fits:
+                    return (i, j), candidates, cells
+        return None, candidates, cells
+    
+    def place(self, x, y, w, h):
+        place(self.grid, x, y, w, h, 1)
+    
+    def snapshot(self):
+        return [row[:] for row in self.grid], 8 * self.width * self.height
+    
+    def restore(self, state):
+        self.grid = [row[:] for row in state]
+
+
+#dekoder oparty o liste maksymalnych wolnych prostokatow (maximal rectangles)
+#prostokat to (gora, lewo, dol, prawo), dol i prawo bez ostatniej komorki
+#lista jest posortowana po (gora, lewo), wiec pierwszy prostokat, w ktory wchodzi pudelko,
+#daje te sama pozycje co skanowanie wierszami - koszt zalezy od liczby prostokatow, nie od pola siatki
+class FreeRectangles:
+    def __init__(self, maskIndex):
+        self.width = maskIndex.width
+        self.height = maskIndex.height
+        self.rects = list(maskIndex.free_rectangles())
+    
+    def find(self, w, h):
+        #puste pudelko pasuje od razu w rogu, tak jak przy can_place
+        if w <= 0 or h <= 0:
+            return (0, 0) if h <= self.height and w <= self.width else None
+        
+        for top, left, bottom, right in self.rects:
+            if bottom - top >= h and right - left >= w:
+                return (top, left)
+        return None
+    
+    #find dla profilera - sprawdzane sa prostokaty, nie komorki siatki
+    def find_counted(self, w, h):
+        anchor = self.find(w, h)
+        if anchor is None or w <= 0 or h <= 0:
+            return anchor, len(self.rects), 0
+        for candidates, (top, left, bottom, right) in enumerate(self.rects, 1):
+            if bottom - top >= h and right - left >= w:
+                return anchor, candidates, 0
+    
+    def place(self, x, y, w, h):
+        self.rects = split_free_rectangles(self.rects, x, y, w, h)
+    
+    #split_free_rectangles zawsze zwraca nowa liste, wiec mozna ja wspoldzielic
+    def snapshot(self):
+        return self.rects, 100 * len(self.rects)
+    
+    def restore(self, state):
+        self.rects = state
+
+
+#dostepne dekodery dla evaluate / run_optimization
+DECODERS = {
+    'scan': ScanGrid,
+    'grid': OccupancyGrid,
+    'maxrects': FreeRectangles,
+}
+
+
+#pamiec stanow dekodera dla prefiksow genomu
+#potomek z crossover ma prefiks rodzica, a mutate zmienia 1-2 geny, wiec wiekszosc
+#osobnikow moze wznowic dekodowanie od zapamietanego stanu zamiast od pustej siatki
+#stan zapisywany jest co stride genow, klucz to (dlugosc prefiksu, hash lancuchowy genow)
+#wpis trzyma tez same geny prefiksu - kolizja hash nie moze przywrocic stanu innego genomu
+#najdawniej uzywane wpisy sa usuwane po przekroczeniu maxBytes
+class PrefixCache:
+    def __init__(self, maxBytes=64 * 1024 * 1024, stride=8):
+        self.maxBytes = maxBytes
+        self.stride = max(1, stride)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.reusedGenes = 0
+        self.decodedGenes = 0
+    
+    #klucze wszystkich prefiksow o dlugosci podzielnej przez stride
+    def prefix_keys(self, individual):
+        keys = []
+        chain = 0
+        for position, gene in enumerate(individual, 1):
+            chain = hash((chain, gene))
+            if position % self.stride == 0:
+                keys.append((position, chain))
+        return keys
+    
+    #najdluzszy zapamietany prefiks osobnika albo None
+    def lookup(self, keys, individual):
+        for key in reversed(keys):
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == tuple(individual[:key[0]]):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return key[0], entry[1], entry[2]
+        self.misses += 1
+        return None
+    
+    def store(self, key, individual, state, stateBytes, placed):
+        prefix = tuple(individual[:key[0]])
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] == prefix:
+                self.entries.move_to_end(key)
+                return
+            #kolizja - wpis innego prefiksu jest zastepowany
+            self.bytes -= self.entries.pop(key)[3]
+        
+        size = stateBytes + 8 * (len(placed) + len(prefix)) + 200
+        if size > self.maxBytes:
+            return
+        
+        self.entries[key] = (prefix, state, tuple(placed), size)
+        self.bytes += size
+        while self.bytes > self.maxBytes:
+            _, (_, _, _, oldSize) = self.entries.popitem(last=False)
+            self.bytes -= oldSize
+
+
+#pamiec wynikow evaluate (LRU, maxEntries wpisow)
+#klucz to postac kanoniczna genomu - ciag ksztaltow (w, h) po obrocie, bo pudelka o tym samym
+#ksztalcie sa wymienne i daja to samo rozmieszczenie
+#rozmieszczenie trzymane jest z pozycjami genow zamiast indeksow pudelek
+class FitnessCache:
+    def __init__(self, boxes, maxEntries=10000):
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        
+        #numer ksztaltu dla kazdego pudelka bez obrotu i z obrotem
+        shapeIds = {}
+        self.geneShapes = []
+        for w, h in boxes:
+            normal = shapeIds.setdefault((w, h), len(shapeIds))
+            rotated = shapeIds.setdefault((h, w), len(shapeIds))
+            self.geneShapes.append((normal, rotated))
+    
+    def key(self, individual):
+        geneShapes = self.geneShapes
+        return tuple([geneShapes[idx][rotated] for idx, rotated in individual])
+    
+    def get(self, key, individual):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        self.entries.move_to_end(key)
+        self.hits += 1
+        score, placedPositions = entry
+        placed = [(boxId, individual[gene][0], corner, size) for boxId, gene, corner, size in placedPositions]
+        return score, placed
+    
+    def store(self, key, individual, score, placed):
+        genePositions = {idx: gene for gene, (idx, _) in enumerate(individual)}
+        placedPositions = tuple((boxId, genePositions[idx], corner, size) for boxId, idx, corner, size in placed)
+        
+        self.entries[key] = (score, placedPositions)
+        if len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+
+
+#wszystko co jest stale przez cale uruchomienie: indeks maski, dekoder i pamieci podreczne
+class Evaluator:
+    def __init__(self, boxes, mask, width, height, decoder='grid', prefixCacheBytes=64 * 1024 * 1024, fitnessCacheSize=10000, lockstep=False, racing=0):
+        self.boxes = boxes
+        self.mask = mask
+        self.width = width
+        self.height = height
+        self.decoder = decoder
+        self.prefixCacheBytes = prefixCacheBytes
+        #lockstep - brakujace wyniki liczone razem przez evaluate_population
+        self.lockstep = lockstep
+        #racing > 0 - ocena pokolen wyscigiem (Race), tyle sprawdzen granicy na osobnika
+        self.racing = racing
+        #Profiler albo None; can_place liczone tylko przy ocenie w tym procesie
+        self.profiler = None
+        
+        self.pool = None
+        self.workers = 1
+        #liczniki pamieci prefiksow zebrane z procesow
+        self.workerCounters = {'prefixCacheHits': 0, 'prefixCacheMisses': 0, 'reusedGenes': 0, 'decodedGenes': 0, 'skippedScans': 0, 'earlyExits': 0, 'racedOut': 0, 'savedGenes': 0}
+        #liczniki przycinania w evaluate (pominiete szukania miejsca, wczesniej zakonczone dekodowania)
+        self.pruning = {'skippedScans': 0, 'earlyExits': 0}
+        #liczniki wyscigu (osobniki odrzucone przed koncem dekodowania, niedekodowane geny)
+        self.raceCounters = {'racedOut': 0, 'savedGenes': 0}
+        
+        #maska jest stala przez cale uruchomienie - pozycje dla kazdego ksztaltu liczone raz, przy pierwszym uzyciu
+        #(dekodery scan i maxrects ich nie uzywaja)
+        self.maskIndex = MaskIndex(mask, width, height)
+        
+        #okolo 32 migawek na osobnika, 0 wylacza pamiec prefiksow
+        self.prefixCache = None
+        if prefixCacheBytes > 0:
+            self.prefixCache = PrefixCache(prefixCacheBytes, len(boxes) // 32)
+        
+        #0 wylacza pamiec wynikow
+        self.fitnessCache = None
+        if fitnessCacheSize > 0:
+            self.fitnessCache = FitnessCache(boxes, fitnessCacheSize)
+    
+    #rozdziela evaluate na workers procesow; pudelka i maska trafiaja do kazdego procesu raz, przez initializer
+    def start_pool(self, workers):
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(self.boxes, self.mask, self.width, self.height, self.decoder, self.prefixCacheBytes, self.lockstep, self.racing)
+        )
+        self.workers = workers
+    
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+    
+    def evaluate(self, individual):
+        if self.fitnessCache is None:
+            return evaluate(individual, self.mask, self.boxes, self.width, self.height, self.maskIndex, self.decoder, self.prefixCache, self.profiler, self.pruning)
+        
+        key = self.fitnessCache.key(individual)
+        cached = self.fitnessCache.get(key, individual)
+        if cached is not None:
+            return cached
+        
+        score, placed = evaluate(individual, self.mask, self.boxes, self.width, self.height, self.maskIndex, self.decoder, self.prefixCache, self.profiler, self.pruning)
+        self.fitnessCache.store(key, individual, score, placed)
+        return score, placed
+    
+    #ocena bez pamieci wynikow - jeden po drugim albo wszystkie naraz
+    def evaluate_batch(self, batch):
+        if self.lockstep:
+            return evaluate_population(batch, self.mask, self.boxes, self.width, self.height, self.maskIndex)
+        return [evaluate(ind, self.mask, self.boxes, self.width, self.height, self.maskIndex, self.decoder, self.prefixCache, self.profiler, self.pruning) for ind in batch]
+    
+    #ocena paczki wyscigiem - (wynik, rozmieszczenie, czy wynik jest dokladny)
+    #knownScores - dokladne wyniki innych osobnikow tego samego pokolenia (prog startowy)
+    def race_batch(self, batch, knownScores):
+        race = Race(self.racing, knownScores)
+        results = []
+        for ind in batch:
+            racedOut = race.racedOut
+            score, placed = evaluate(ind, self.mask, self.boxes, self.width, self.height, self.maskIndex, self.decoder, self.prefixCache, self.profiler, self.pruning, race)
+            exact = race.racedOut == racedOut
+            if exact:
+                race.add(score)
+            results.append((score, placed, exact))
+        
+        self.raceCounters['racedOut'] += race.racedOut
+        self.raceCounters['savedGenes'] += race.savedGenes
+        return results
+    
+    #wyniki dla calej populacji w tej samej kolejnosci co population
+    #race=True - wyscig (Race), jezeli wlaczony; wyniki spoza RACE_KEEP najlepszych moga byc zanizone
+    def evaluate_many(self, population, race=False):
+        race = race and self.racing > 0 and not self.lockstep
+        if self.pool is None and not self.lockstep and not race:
+            return [self.evaluate(ind) for ind in population]
+        
+        #z pamieci wynikow, a reszta razem (w procesach albo lockstep) i bez powtorzen
+        fitnessCache = self.fitnessCache
+        results = [None] * len(population)
+        missing = {}
+        for position, ind in enumerate(population):
+            key = fitnessCache.key(ind) if fitnessCache else position
+            if key in missing:
+                missing[key].append(position)
+                continue
+            
+            cached = fitnessCache.get(key, ind) if fitnessCache else None
+            if cached is not None:
+                results[position] = cached
+            else:
+                missing[key] = [position]
+        
+        todo = [population[positions[0]] for positions in missing.values()]
+        #wyniki z pamieci sa dokladne - od nich zaczyna sie prog wyscigu
+        knownScores = [result[0] for result in results if result is not None] if race else None
+        if self.pool is None:
+            done = self.race_batch(todo, knownScores) if race else self.evaluate_batch(todo)
+        else:
+            #po dwie paczki genomow na proces
+            batchSize = max(1, -(-len(todo) // (2 * self.workers)))
+            batches = [todo[k:k + batchSize] for k in range(0, len(todo), batchSize)]
+            
+            done = []
+            for batchResults, counters in self.pool.map(evaluate_batch, batches, itertools.repeat(knownScores)):
+                done.extend(batchResults)
+                for name, value in counters.items():
+                    self.workerCounters[name] += value
+        if not race:
+            done = [(score, placed, True) for score, placed in done]
+        
+        for (key, positions), (score, placed, exact) in zip(missing.items(), done):
+            results[positions[0]] = (score, placed)
+            #wynik z przerwanego wyscigu nie trafia do pamieci wynikow
+            if not exact:
+                for position in positions[1:]:
+                    results[position] = (score, placed)
+            elif fitnessCache:
+                fitnessCache.store(key, population[positions[0]], score, placed)
+                #powtorzenia w populacji - rozmieszczenie z indeksami ich wlasnych pudelek
+                for position in positions[1:]:
+                    results[position] = fitnessCache.get(key, population[position])
+        
+        return results
+    
+    #statystyki pamieci podrecznych do slownika wynikow
+    def stats(self):
+        fitnessCache = self.fitnessCache
+        stats = {
+            'cacheHits': fitnessCache.hits if fitnessCache else 0,
+            'cacheMisses': fitnessCache.misses if fitnessCache else 0
+        }
+        stats.update(prefix_counters(self.prefixCache))
+        stats.update(self.pruning)
+        stats.update(self.raceCounters)
+        for name, value in self.workerCounters.items():
+            stats[name] += value
+        return stats
+
+
+def prefix_counters(prefixCache):
+    return {
+        'prefixCacheHits': prefixCache.hits if prefixCache else 0,
+        'prefixCacheMisses': prefixCache.misses if prefixCache else 0,
+        'reusedGenes': prefixCache.reusedGenes if prefixCache else 0,
+        'decodedGenes': prefixCache.decodedGenes if prefixCache else 0
+    }
+
+
+#Evaluator procesu roboczego, tworzony raz przez initializer puli
+workerEvaluator = None
+
+
+def init_worker(boxes, mask, width, height, decoder, prefixCacheBytes, lockstep, racing):
+    global workerEvaluator
+    #pamiec wynikow jest w procesie glownym
+    workerEvaluator = Evaluator(boxes, mask, width, height, decoder, prefixCacheBytes, 0, lockstep, racing)
+
+
+#paczka genomow -> wyniki i przyrost licznikow pamieci prefiksow w tym procesie
+#knownScores nie None - wyscig w obrebie paczki (prog nie wyzszy niz dla calego pokolenia)
+def evaluate_batch(batch, knownScores=None):
+    before = {**prefix_counters(workerEvaluator.prefixCache), **workerEvaluator.pruning, **workerEvaluator.raceCounters}
+    if knownScores is None:
+        results = workerEvaluator.evaluate_batch(batch)
+    else:
+        results = workerEvaluator.race_batch(batch, knownScores)
+    after = {**prefix_counters(workerEvaluator.prefixCache), **workerEvaluator.pruning, **workerEvaluator.raceCounters}
+    return results, {name: after[name] - before[name] for name in after}
+
+
 def generate_individual(boxes):
     indices = list(range(len(boxes))) # lista z indeksami pudelek
     random.shuffle(indices) # losowe przemieszanie
@@ -31,8 +677,10 @@ def generate_individual(boxes):
 
 def crossover(parent1, parent2):
     cut = random.randint(1, len(parent1) - 1) # punkt podzialu
-    child1 = parent1[:cut] + [gene for gene in parent2 if gene[0] not in [g[0] for g in parent1[:cut]]]
-    child2 = parent2[:cut] + [gene for gene in parent1 if gene[0] not in [g[0] for g in parent2[:cut]]] 
+    prefix1 = {g[0] for g in parent1[:cut]} # zbior zamiast listy - sprawdzenie w O(1)
+    prefix2 = {g[0] for g in parent2[:cut]}
+    child1 = parent1[:cut] + [gene for gene in parent2 if gene[0] not in prefix1]
+    child2 = parent2[:cut] + [gene for gene in parent1 if gene[0] not in prefix2]
     return child1, child2
 
 
@@ -48,82 +696,821 @@ def mutate(individual):
     return ind
 
 
-def evaluate(individual, mask, boxes, width, height):
-    grid = [[0] * width for _ in range(height)]
+#poczatkowa populacja z heurystyk zamiast samego losowania (iterate_optimization(..., seeding=...))
+#kazda strategia to kolejnosc pudelek i obroty; rowne klucze w losowej kolejnosci,
+#wiec kolejne osobniki z tej samej strategii sie roznia
+def ordered_individual(boxes, key, rotated):
+    indices = list(range(len(boxes)))
+    random.shuffle(indices)
+    indices.sort(key=key)
+    return [(i, rotated(i)) for i in indices]
+
+
+#dluzszy bok poziomo - first-fit wypelnia siatke wierszami
+def lying(boxes):
+    return lambda i: boxes[i][1] > boxes[i][0]
+
+
+def seed_area_descending(boxes, maskIndex):
+    return ordered_individual(boxes, lambda i: -boxes[i][0] * boxes[i][1], lying(boxes))
+
+
+#najmniejsze najpierw - zwykle najwiecej postawionych pudelek
+def seed_area_ascending(boxes, maskIndex):
+    return ordered_individual(boxes, lambda i: boxes[i][0] * boxes[i][1], lying(boxes))
+
+
+def seed_longest_side(boxes, maskIndex):
+    return ordered_individual(boxes, lambda i: (-max(boxes[i]), -min(boxes[i])), lying(boxes))
+
+
+#obrot, w ktorym maska dopuszcza wiecej pozycji; pudelka, ktore nigdzie sie nie mieszcza, na koniec
+def seed_mask_aware(boxes, maskIndex):
+    keys = {}
+    rotations = {}
+    for i, (w, h) in enumerate(boxes):
+        normal = maskIndex.anchor_count(w, h)
+        rotated = maskIndex.anchor_count(h, w)
+        rotations[i] = rotated > normal or (rotated == normal and h > w)
+        keys[i] = (max(normal, rotated) == 0, w * h)
+    return ordered_individual(boxes, keys.__getitem__, rotations.__getitem__)
+
+
+SEEDING_STRATEGIES = {
+    'areaDescending': seed_area_descending,
+    'areaAscending': seed_area_ascending,
+    'longestSide': seed_longest_side,
+    'maskAware': seed_mask_aware
+}
+
+
+#szybkie przeszukiwanie lokalne: niepostawione pudelko zamienia sie miejscem z jednym z ostatnich
+#postawionych wiekszych pudelek (albo zwykla mutacja), zmiana zostaje, jezeli wynik nie jest gorszy
+#zamiany blisko konca kolejnosci sa tanie - evaluate wznawia od zapamietanego prefiksu
+def polish(evaluator, individual, steps):
+    boxes = evaluator.boxes
+    score, placed = evaluator.evaluate(individual)
+    for _ in range(steps):
+        placedIds = {idx for _, idx, _, _ in placed}
+        unplaced = [position for position, (idx, _) in enumerate(individual) if idx not in placedIds]
+        
+        candidate = None
+        if unplaced and random.random() < 0.5:
+            source = random.choice(unplaced)
+            w, h = boxes[individual[source][0]]
+            larger = [position for position, (idx, _) in enumerate(individual[:source]) if idx in placedIds and boxes[idx][0] * boxes[idx][1] > w * h]
+            if larger:
+                target = random.choice(larger[-8:])
+                candidate = individual[:]
+                candidate[source], candidate[target] = candidate[target], candidate[source]
+        if candidate is None:
+            candidate = mutate(individual)
+        
+        candidateScore, candidatePlaced = evaluator.evaluate(candidate)
+        if candidateScore >= score:
+            individual, score, placed = candidate, candidateScore, candidatePlaced
+    
+    return individual
+
+
+#count osobnikow z podanych strategii (po kolei, w kolko), kazdy opcjonalnie dopracowany przez polish
+def seed_population(evaluator, boxes, strategies, count, polishSteps=0):
+    if isinstance(strategies, str):
+        strategies = [strategies]
+    
+    seeds = []
+    for k in range(count):
+        individual = SEEDING_STRATEGIES[strategies[k % len(strategies)]](boxes, evaluator.maskIndex)
+        if polishSteps > 0:
+            individual = polish(evaluator, individual, polishSteps)
+        seeds.append(individual)
+    return seeds
+
+
+#populacja jako tablice: permutacje (P x n, int32) i obroty (P x n, bool)
+def population_to_arrays(population):
+    perms = np.array([[idx for idx, _ in ind] for ind in population], dtype=np.int32)
+    rots = np.array([[rotated for _, rotated in ind] for ind in population], dtype=bool)
+    return perms, rots
+
+
+def arrays_to_population(perms, rots):
+    #gotowe krotki (idx, obrot) - kazdy wiersz to tylko wybor z tablicy, bez tworzenia nowych krotek
+    genes = [(idx, rotated) for idx in range(perms.shape[1]) for rotated in (False, True)]
+    codes = (perms.astype(np.int64) * 2 + rots).tolist()
+    return [list(map(genes.__getitem__, row)) for row in codes]
+
+
+#crossover z zachowaniem kolejnosci dla wielu par naraz
+#dziecko = prefiks pierwszego rodzica + geny drugiego rodzica spoza prefiksu, w jego kolejnosci
+def order_crossover(perms1, rots1, perms2, rots2, cuts):
+    count, length = perms1.shape
+    rows = np.arange(count)[:, None]
+    cols = np.arange(length)
+    
+    #pozycja kazdego pudelka w pierwszym rodzicu
+    positions1 = np.empty_like(perms1)
+    positions1[rows, perms1] = cols
+    
+    inPrefix = cols[None, :] < cuts[:, None]
+    notInPrefix = positions1[rows, perms2] >= cuts[:, None]
+    
+    #stabilne sortowanie wybranych genow na poczatek zachowuje ich kolejnosc
+    take = np.concatenate([inPrefix, notInPrefix], axis=1)
+    order = np.argsort(~take, axis=1, kind='stable')[:, :length]
+    childPerms = np.take_along_axis(np.concatenate([perms1, perms2], axis=1), order, axis=1)
+    childRots = np.take_along_axis(np.concatenate([rots1, rots2], axis=1), order, axis=1)
+    return childPerms, childRots
+
+
+#mutate dla calej populacji - kazdy osobnik z prawdopodobienstwem rate
+#polowa mutacji zamienia dwa geny, polowa odwraca obrot jednego
+def mutate_batch(perms, rots, rate, rng):
+    count, length = perms.shape
+    mutated = rng.random(count) < rate
+    swap = rng.random(count) < 0.5
+    first = rng.integers(0, length, count)
+    #druga pozycja zawsze rozna od pierwszej
+    second = (first + rng.integers(1, max(length, 2), count)) % length
+    
+    rows = np.flatnonzero(mutated & swap)
+    i, j = first[rows], second[rows]
+    perms[rows, i], perms[rows, j] = perms[rows, j], perms[rows, i]
+    rots[rows, i], rots[rows, j] = rots[rows, j], rots[rows, i]
+    
+    rows = np.flatnonzero(mutated & ~swap)
+    rots[rows, first[rows]] ^= True
+
+
+#breed na tablicach - rodzice z 10 najlepszych, crossover i mutacja dla wszystkich par naraz
+def breed_arrays(scores, populationSize, mutationRate, rng, profiler=None):
+    perms, rots = population_to_arrays([ind for _, ind in scores[:10]])
+    length = perms.shape[1]
+    pairs = (populationSize + 1) // 2
+    
+    parents1 = rng.integers(0, len(perms), pairs)
+    parents2 = rng.integers(0, len(perms), pairs)
+    cuts = rng.integers(1, length, pairs)
+    
+    startTime = time.perf_counter()
+    childPerms1, childRots1 = order_crossover(perms[parents1], rots[parents1], perms[parents2], rots[parents2], cuts)
+    childPerms2, childRots2 = order_crossover(perms[parents2], rots[parents2], perms[parents1], rots[parents1], cuts)
+    
+    #dzieci parami, tak jak w breed
+    childPerms = np.stack([childPerms1, childPerms2], axis=1).reshape(-1, length)[:populationSize]
+    childRots = np.stack([childRots1, childRots2], axis=1).reshape(-1, length)[:populationSize]
+    mutateTime = time.perf_counter()
+    mutate_batch(childPerms, childRots, mutationRate, rng)
+    
+    if profiler is not None:
+        profiler.add_time('crossover', mutateTime - startTime, pairs)
+        profiler.add_time('mutate', time.perf_counter() - mutateTime)
+    
+    return arrays_to_population(childPerms, childRots)
+
+
+#ile najlepszych osobnikow zostaje rodzicami (breed, breed_arrays)
+RACE_KEEP = 10
+
+
+#wyscig w ocenie jednego pokolenia - rodzicami zostaje tylko RACE_KEEP najlepszych, wiec osobnik,
+#ktory nawet w najlepszym razie nie dogoni RACE_KEEP-tego dokladnego wyniku, nie musi byc dekodowany do konca
+#granica z prefiksu: postawione pudelka + ile najmniejszych z pozostalych zmiesci sie w wolnych komorkach
+#odrzucony dostaje wynik prefiksu - nie wiekszy od prawdziwego i nadal ponizej progu, wiec RACE_KEEP najlepszych (i caly przebieg) jest taki sam jak przy pelnej ocenie
+#checks - ile razy granica jest sprawdzana w trakcie dekodowania jednego osobnika
+class Race:
+    def __init__(self, checks, knownScores=()):
+        self.checks = checks
+        #RACE_KEEP najlepszych dokladnych wynikow (kopiec, na szczycie najmniejszy)
+        self.top = heapq.nlargest(RACE_KEEP, knownScores)
+        heapq.heapify(self.top)
+        self.racedOut = 0
+        self.savedGenes = 0
+    
+    #None dopoki nie ma RACE_KEEP dokladnych wynikow
+    def threshold(self):
+        return self.top[0] if len(self.top) >= RACE_KEEP else None
+    
+    def add(self, score):
+        if len(self.top) < RACE_KEEP:
+            heapq.heappush(self.top, score)
+        elif score > self.top[0]:
+            heapq.heapreplace(self.top, score)
+
+
+#najwiecej pudelek od position do konca, ktore zmieszcza sie polem w wolnych komorkach (najmniejsze najpierw)
+def race_bound(areas, position, freeCells):
+    return bisect.bisect_right(list(itertools.accumulate(sorted(areas[position:]))), freeCells)
+
+
+#przycinanie - pudelka, ktore na pewno sie nie zmieszcza, nie sa szukane (rozmieszczenie bez zmian):
+#  - pole pudelka wieksze niz liczba wolnych komorek
+#  - ksztalt nie mniejszy w obu wymiarach od ksztaltu, ktory juz sie nie zmiescil (zajetosc tylko rosnie)
+#gdy zadne z pozostalych pudelek nie moze sie zmiescic, dekodowanie konczy sie od razu
+#pruning - opcjonalny slownik licznikow skippedScans i earlyExits
+#race - opcjonalny Race; dekodowanie przerywane, gdy granica spadnie ponizej progu (wynik z prefiksu)
+def evaluate(individual, mask, boxes, width, height, maskIndex=None, decoder='grid', prefixCache=None, profiler=None, pruning=None, race=None):
+    #bez gotowego indeksu pozycje dla ksztaltow sa liczone na biezaco
+    if maskIndex is None:
+        maskIndex = MaskIndex(mask, width, height)
+    
+    grid = DECODERS[decoder](maskIndex)
     placed = []
-    boxIdCounter = 1
-    
-    for idx, rotated in individual:
-        w, h = boxes[idx]
-        if rotated:
-            w, h = h, w
-        
-        placedFlag = False
-        for i in range(height):
-            for j in range(width):
-                if can_place(grid, i, j, w, h, mask):
-                    place(grid, i, j, w, h, boxIdCounter)
-                    placed.append((boxIdCounter, idx, (j, i), (w, h)))
-                    boxIdCounter += 1
-                    placedFlag = True
-                    break
-            if placedFlag:
+    start = 0
+    
+    #wznow od najdluzszego prefiksu, ktory byl juz dekodowany
+    if prefixCache is not None:
+        keys = prefixCache.prefix_keys(individual)
+        cached = prefixCache.lookup(keys, individual)
+        if cached is not None:
+            start, state, cachedPlaced = cached
+            grid.restore(state)
+            placed = list(cachedPlaced)
+        prefixCache.reusedGenes += start
+        prefixCache.decodedGenes += len(individual) - start
+    
+    boxIdCounter = len(placed) + 1
+    
+    #ksztalty po obrocie i najmniejsze pole, szerokosc i wysokosc od kazdej pozycji do konca
+    shapes = [(boxes[idx][1], boxes[idx][0]) if rotated else boxes[idx] for idx, rotated in individual]
+    remainingArea = list(itertools.accumulate((w * h for w, h in reversed(shapes)), min))[::-1]
+    remainingWidth = list(itertools.accumulate((w for w, _ in reversed(shapes)), min))[::-1]
+    remainingHeight = list(itertools.accumulate((h for _, h in reversed(shapes)), min))[::-1]
+    
+    freeCells = maskIndex.freeCells - sum(w * h for _, _, _, (w, h) in placed)
+    #najmniejsze ksztalty, ktore sie nie zmiescily
+    failed = []
+    skipped = 0
+    
+    threshold = race.threshold() if race is not None else None
+    if threshold is not None:
+        raceStride = max(1, len(individual) // (race.checks + 1))
+        areas = [w * h for w, h in shapes]
+    
+    for position in range(start, len(individual)):
+        #zadne z pozostalych pudelek sie nie zmiesci
+        if freeCells < remainingArea[position] or any(fw <= remainingWidth[position] and fh <= remainingHeight[position] for fw, fh in failed):
+            skipped += len(individual) - position
+            if pruning is not None:
+                pruning['earlyExits'] += 1
+            break
+        
+        #nawet w najlepszym razie ponizej progu wyscigu
+        if threshold is not None and position > 0 and position % raceStride == 0:
+            if len(placed) + race_bound(areas, position, freeCells) < threshold:
+                race.racedOut += 1
+                race.savedGenes += len(individual) - position
+                if prefixCache is not None:
+                    prefixCache.decodedGenes -= len(individual) - position
                 break
+        
+        idx, rotated = individual[position]
+        w, h = shapes[position]
+        
+        if w * h > freeCells or any(fw <= w and fh <= h for fw, fh in failed):
+            skipped += 1
+            anchor = None
+        #pierwsze wolne miejsce (first-fit), tak jak przy skanowaniu wierszami
+        elif profiler is None:
+            anchor = grid.find(w, h)
+        else:
+            anchor = profiler.find(grid, w, h)
+        
+        if anchor is not None:
+            i, j = anchor
+            grid.place(i, j, w, h)
+            placed.append((boxIdCounter, idx, (j, i), (w, h)))
+            boxIdCounter += 1
+            freeCells -= w * h
+        elif not any(fw <= w and fh <= h for fw, fh in failed):
+            failed = [(fw, fh) for fw, fh in failed if not (w <= fw and h <= fh)]
+            failed.append((w, h))
+        
+        if prefixCache is not None and (position + 1) % prefixCache.stride == 0:
+            state, stateBytes = grid.snapshot()
+            prefixCache.store(keys[position // prefixCache.stride], individual, state, stateBytes, placed)
     
+    if pruning is not None:
+        pruning['skippedScans'] += skipped
+    if profiler is not None and skipped:
+        profiler.count('skippedScans', skipped)
     return len(placed), placed
 
 
-def run_optimization(boxes, mask, width, height, generations, populationSize, mutationRate):
+#ocena calej populacji naraz - wszystkie osobniki przesuwaja sie o jedno pudelko na krok
+#stos tablic sum prefiksowych (P, wysokosc + 1, szerokosc + 1), a w kazdym kroku osobniki
+#z tym samym ksztaltem pudelka sprawdzane sa jedna operacja na tablicach
+#wyniki takie same jak evaluate dla kazdego osobnika
+def evaluate_population(population, mask, boxes, width, height, maskIndex=None):
+    if maskIndex is None:
+        maskIndex = MaskIndex(mask, width, height)
+    if not population:
+        return []
+    
+    perms, rots = population_to_arrays(population)
+    count, length = perms.shape
+    boxSizes = np.array(boxes, dtype=np.int64).reshape(-1, 2)
+    widths = np.where(rots, boxSizes[perms, 1], boxSizes[perms, 0])
+    heights = np.where(rots, boxSizes[perms, 0], boxSizes[perms, 1])
+    
+    sats = np.zeros((count, height + 1, width + 1), dtype=np.int32)
+    rowRange = np.arange(height + 1, dtype=np.int32)
+    colRange = np.arange(width + 1, dtype=np.int32)
+    placedLists = [[] for _ in range(count)]
+    
+    #numer ksztaltu (w, h) w kazdym kroku - grupowanie jedna operacja
+    shapeCodes = widths * (heights.max(initial=0) + 1) + heights
+    
+    for step in range(length):
+        codes, groups = np.unique(shapeCodes[:, step], return_inverse=True)
+        
+        fitted = []
+        for shapeNo in range(len(codes)):
+            members = np.flatnonzero(groups == shapeNo)
+            w = int(widths[members[0], step])
+            h = int(heights[members[0], step])
+            anchors = maskIndex.anchors(w, h)
+            if anchors.count == 0:
+                continue
+            
+            if anchors.dense:
+                free = (window_sums(sats[members], w, h) == 0).reshape(len(members), -1)
+                if anchors.allowed is not None:
+                    free &= anchors.allowed_cells()
+            else:
+                free = anchors.window_sums(sats[members].reshape(len(members), -1)) == 0
+            
+            firstFree = free.argmax(axis=1)
+            fits = free[np.arange(len(members)), firstFree]
+            if not fits.any():
+                continue
+            members = members[fits]
+            firstFree = firstFree[fits]
+            
+            if anchors.dense:
+                xs, ys = np.divmod(firstFree, anchors.colsCount)
+            else:
+                xs, ys = anchors.position(firstFree)
+            fitted.append((members, xs, ys))
+        
+        if not fitted:
+            continue
+        
+        members = np.concatenate([group[0] for group in fitted])
+        xs = np.concatenate([group[1] for group in fitted]).astype(np.int32)
+        ys = np.concatenate([group[2] for group in fitted]).astype(np.int32)
+        ws = widths[members, step].astype(np.int32)
+        hs = heights[members, step].astype(np.int32)
+        
+        #to samo co OccupancyGrid.place, dla wszystkich postawionych w tym kroku naraz
+        rows = np.minimum(np.maximum(rowRange[None, :] - xs[:, None], 0), hs[:, None])
+        cols = np.minimum(np.maximum(colRange[None, :] - ys[:, None], 0), ws[:, None])
+        sats[members] += rows[:, :, None] * cols[:, None, :]
+        
+        for member, x, y, w, h in zip(members.tolist(), xs.tolist(), ys.tolist(), ws.tolist(), hs.tolist()):
+            placed = placedLists[member]
+            placed.append((len(placed) + 1, int(perms[member, step]), (y, x), (w, h)))
+    
+    return [(len(placed), placed) for placed in placedLists]
+
+
+def run_optimization(boxes, mask, width, height, generations, populationSize, mutationRate, **options):
+    return run_to_end(iterate_optimization(boxes, mask, width, height, generations, populationSize, mutationRate, **options))
+
+
+#przechodzi przez wszystkie pokolenia i zwraca wynik koncowy generatora
+#progress(stats) - opcjonalnie wywolywane ze statystykami kazdego pokolenia
+def run_to_end(steps, progress=None):
+    while True:
+        try:
+            stats = next(steps)
+        except StopIteration as stop:
+            return stop.value
+        if progress is not None:
+            progress(stats)
+
+
+#run_optimization krok po kroku - generator zwraca statystyki po kazdym pokoleniu,
+#a slownik wynikow (taki jak z run_optimization) jako wartosc StopIteration
+#zatrzymanie przed koncem pokolen:
+#  - od razu, gdy wszystkie pudelka zostaly postawione
+#  - stagnation - tyle pokolen bez poprawy najlepszego wyniku
+#  - convergence - najlepszy wynik pokolenia rozni sie od sredniego o nie wiecej niz tyle
+#  - timeBudget - limit czasu w sekundach
+#  - stop() zwraca True (np. przycisk anuluj w GUI)
+#checkpoint - plik, do ktorego co checkpointInterval pokolen zapisywany jest stan (w tle, modul checkpoint)
+#resume=True - start od stanu zapisanego w pliku checkpoint (jezeli istnieje), wynik jak bez przerwy
+#seeding - nazwa albo lista strategii z SEEDING_STRATEGIES; seedFraction populacji poczatkowej
+#pochodzi z heurystyk, kazdy taki osobnik dopracowany przez polish krokow przeszukiwania lokalnego
+#racing > 0 - ocena pokolen wyscigiem (Race) z tyloma sprawdzeniami granicy na osobnika; najlepszy wynik
+#i przebieg bez zmian, ale worstScore i meanScore pokolen (i convergence) licza sie z zanizonych wynikow;
+#oszczednosc w racedOut i savedGenes; bez dzialania przy lockstep
+def iterate_optimization(boxes, mask, width, height, generations, populationSize, mutationRate, decoder='grid', prefixCacheBytes=64 * 1024 * 1024, fitnessCacheSize=10000, workers=0, breeding='list', lockstep=False, stagnation=0, convergence=None, timeBudget=None, stop=None, profile=False, checkpoint=None, checkpointInterval=10, resume=False, seeding=None, seedFraction=0.2, polish=0, racing=0):
     startTime = time.time()
     
-    population = [generate_individual(boxes) for _ in range(populationSize)]
+    resumeState = load_checkpoint(checkpoint) if resume and checkpoint is not None and os.path.exists(checkpoint) else None
+    
+    evaluator = Evaluator(boxes, mask, width, height, decoder, prefixCacheBytes, fitnessCacheSize, lockstep, racing)
+    #profile=True - czasy faz i liczniki can_place w wyniku ('profile')
+    if profile:
+        evaluator.profiler = Profiler()
+    #workers > 1 - ocena populacji w osobnych procesach, wyniki takie same jak szeregowo
+    if workers > 1:
+        evaluator.start_pool(workers)
+    writer = CheckpointWriter(checkpoint) if checkpoint is not None else None
     
-    scores = [(evaluate(ind, mask, boxes, width, height)[0], ind) for ind in population]
+    try:
+        result = yield from optimize(evaluator, boxes, generations, populationSize, mutationRate, startTime,
+                                     breeding=breeding, stagnation=stagnation, convergence=convergence, timeBudget=timeBudget, stop=stop,
+                                     checkpoint=writer, checkpointInterval=checkpointInterval, resumeState=resumeState,
+                                     seeding=seeding, seedFraction=seedFraction, polishSteps=polish)
+    finally:
+        evaluator.close()
+        checkpointError = writer.close() if writer is not None else None
+    
+    #nieudany zapis stanu nie psuje wyniku optymalizacji
+    if checkpointError is not None:
+        result['checkpointError'] = f"{type(checkpointError).__name__}: {checkpointError}"
+    return result
+
+
+#lista (wynik, osobnik) posortowana od najlepszego
+#race=True - wyscig (Evaluator.racing): RACE_KEEP najlepszych dokladnie, reszta moze miec wynik zanizony
+def score_population(evaluator, population, race=False):
+    profiler = evaluator.profiler
+    if profiler is None:
+        scores = [(result[0], ind) for result, ind in zip(evaluator.evaluate_many(population, race), population)]
+        scores.sort(reverse=True)
+        return scores
+    
+    startTime = time.perf_counter()
+    scores = [(result[0], ind) for result, ind in zip(evaluator.evaluate_many(population, race), population)]
+    sortTime = time.perf_counter()
     scores.sort(reverse=True)
+    profiler.add_time('evaluate', sortTime - startTime, len(population))
+    profiler.add_time('sort', time.perf_counter() - sortTime)
+    return scores
+
+
+def breed(scores, populationSize, mutationRate, profiler=None):
+    newPopulation = []
+    while len(newPopulation) < populationSize:
+        parent1 = random.choice(scores[:10])[1] # bierzemy 10 najlepszych osobnikow i losujemy
+        parent2 = random.choice(scores[:10])[1]
+        
+        if profiler is None:
+            child1, child2 = crossover(parent1, parent2)
+            
+            if random.random() < mutationRate:
+                child1 = mutate(child1)
+            if random.random() < mutationRate:
+                child2 = mutate(child2)
+        else:
+            startTime = time.perf_counter()
+            child1, child2 = crossover(parent1, parent2)
+            profiler.add_time('crossover', time.perf_counter() - startTime)
+            
+            if random.random() < mutationRate:
+                startTime = time.perf_counter()
+                child1 = mutate(child1)
+                profiler.add_time('mutate', time.perf_counter() - startTime)
+            if random.random() < mutationRate:
+                startTime = time.perf_counter()
+                child2 = mutate(child2)
+                profiler.add_time('mutate', time.perf_counter() - startTime)
+        
+        newPopulation.extend([child1, child2])
     
-    firstGenBestScore = scores[0][0]
-    firstGenWorstScore = scores[-1][0]
+    return newPopulation[:populationSize]
+
+
+#generator - opis zatrzymywania przy iterate_optimization
+#migrate(generation, scores) - opcjonalna wymiana osobnikow po ocenie pokolenia (model wyspowy)
+#breeding='array' - crossover i mutacja na tablicach NumPy dla calej populacji naraz
+#checkpoint - CheckpointWriter, dostaje stan po kazdych checkpointInterval pokoleniach
+#resumeState - stan z load_checkpoint, od ktorego optymalizacja jest kontynuowana
+#seeding, seedFraction, polishSteps - heurystyczna czesc populacji poczatkowej (seed_population)
+def optimize(evaluator, boxes, generations, populationSize, mutationRate, startTime, migrate=None, breeding='list', stagnation=0, convergence=None, timeBudget=None, stop=None, checkpoint=None, checkpointInterval=10, resumeState=None, seeding=None, seedFraction=0.2, polishSteps=0):
+    if resumeState is None:
+        population = [generate_individual(boxes) for _ in range(populationSize)]
+        if seeding:
+            seeds = seed_population(evaluator, boxes, seeding, min(populationSize, round(populationSize * seedFraction)), polishSteps)
+            population[:len(seeds)] = seeds
+        
+        #generator NumPy z ziarnem z globalnego random - ten sam seed daje ten sam przebieg
+        rng = np.random.default_rng(random.randrange(2 ** 63)) if breeding == 'array' else None
+        
+        scores = score_population(evaluator, population)
+        
+        firstGenBestScore = scores[0][0]
+        firstGenWorstScore = scores[-1][0]
+        
+        bestScore = 0
+        worstScore = len(boxes)
+        bestIndividual = None
+        
+        generationsRun = 0
+        lastImprovement = 0
+    else:
+        if resumeState['boxCount'] != len(boxes) or len(resumeState['perms']) != populationSize:
+            raise ValueError("Zapisany stan nie pasuje do liczby pudełek lub wielkości populacji")
+        if (resumeState['rngState'] is not None) != (breeding == 'array'):
+            raise ValueError("Zapisany stan pochodzi z innego sposobu krzyżowania (breeding)")
+        
+        #populacja po krzyzowaniu w ostatnim zapisanym pokoleniu i stan losowania z tej samej chwili
+        population = arrays_to_population(resumeState['perms'], resumeState['rots'])
+        random.setstate(resumeState['randomState'])
+        rng = None
+        if breeding == 'array':
+            rng = np.random.default_rng()
+            rng.bit_generator.state = resumeState['rngState']
+        
+        firstGenBestScore = resumeState['firstGenBestScore']
+        firstGenWorstScore = resumeState['firstGenWorstScore']
+        
+        bestScore = resumeState['bestScore']
+        worstScore = resumeState['worstScore']
+        bestIndividual = None
+        if resumeState['bestPerm'] is not None:
+            bestIndividual = arrays_to_population(resumeState['bestPerm'][None, :], resumeState['bestRots'][None, :])[0]
+        
+        generationsRun = resumeState['generation']
+        lastImprovement = resumeState['lastImprovement']
+        startTime -= resumeState['elapsed']
     
-    bestScore = 0
-    worstScore = len(boxes)
-    bestIndividual = None
+    stopReason = 'generations'
+    profiler = evaluator.profiler
     
-    for _ in range(generations):
-        scores = [(evaluate(ind, mask, boxes, width, height)[0], ind) for ind in population]
-        scores.sort(reverse=True)
+    for generation in range(generationsRun, generations):
+        if profiler is not None:
+            profiler.new_generation(generation + 1)
+        
+        scores = score_population(evaluator, population, race=True)
+        generationsRun = generation + 1
         
         if scores[0][0] > bestScore:
             bestScore = scores[0][0]
             bestIndividual = scores[0][1]
+            lastImprovement = generation
         
         if scores[-1][0] < worstScore:
             worstScore = scores[-1][0]
         
-        newPopulation = []
-        while len(newPopulation) < populationSize:
-            parent1 = random.choice(scores[:10])[1] # bierzemy 10 najlepszych osobnikow i losujemy
-            parent2 = random.choice(scores[:10])[1]
-            child1, child2 = crossover(parent1, parent2)
-            
-            if random.random() < mutationRate:
-                child1 = mutate(child1)
-            if random.random() < mutationRate:
-                child2 = mutate(child2)
-            
-            newPopulation.extend([child1, child2])
+        meanScore = sum(score for score, _ in scores) / len(scores)
+        elapsed = time.time() - startTime
+        yield {
+            'generation': generationsRun,
+            'generations': generations,
+            'bestScore': scores[0][0],
+            'worstScore': scores[-1][0],
+            'meanScore': meanScore,
+            'bestSoFar': bestScore,
+            'elapsed': elapsed
+        }
+        
+        #wszystkie pudelka postawione - lepiej juz nie bedzie
+        #wyspy (migrate) licza wszystkie pokolenia - sasiad czeka na migrantow z kazdej wymiany
+        if bestScore == len(boxes) and migrate is None:
+            stopReason = 'allPlaced'
+        elif stagnation > 0 and generation - lastImprovement >= stagnation:
+            stopReason = 'stagnation'
+        elif convergence is not None and scores[0][0] - meanScore <= convergence:
+            stopReason = 'convergence'
+        elif timeBudget is not None and elapsed >= timeBudget:
+            stopReason = 'timeBudget'
+        elif stop is not None and stop():
+            stopReason = 'cancelled'
+        
+        #koncowa populacja to ta oceniona w tym pokoleniu
+        if stopReason != 'generations':
+            break
+        
+        if migrate is not None:
+            scores = migrate(generation, scores)
         
-        population = newPopulation[:populationSize]
+        if rng is not None:
+            population = breed_arrays(scores, populationSize, mutationRate, rng, profiler)
+        else:
+            population = breed(scores, populationSize, mutationRate, profiler)
+        
+        #stan przed ocena nastepnego pokolenia; pakowanie i zapis do pliku w watku CheckpointWriter
+        if checkpoint is not None and generationsRun % checkpointInterval == 0:
+            perms, rots = population_to_arrays(population)
+            bestPerms, bestRots = population_to_arrays([bestIndividual]) if bestIndividual is not None else (None, None)
+            checkpoint.submit({
+                'boxCount': len(boxes),
+                'generation': generationsRun,
+                'bestScore': bestScore,
+                'worstScore': worstScore,
+                'lastImprovement': lastImprovement,
+                'firstGenBestScore': firstGenBestScore,
+                'firstGenWorstScore': firstGenWorstScore,
+                'elapsed': time.time() - startTime,
+                'perms': perms,
+                'rots': rots,
+                'bestPerm': bestPerms[0] if bestPerms is not None else None,
+                'bestRots': bestRots[0] if bestRots is not None else None,
+                'randomState': random.getstate(),
+                'rngState': rng.bit_generator.state if rng is not None else None
+            })
     
     endTime = time.time()
     
-    finalScores = [(evaluate(ind, mask, boxes, width, height)[0], ind) for ind in population]
-    finalScores.sort(reverse=True)
+    if profiler is not None:
+        profiler.new_generation('final')
+    
+    finalScores = score_population(evaluator, population)
     worstIndividual = finalScores[-1][1]
     
-    return {
+    #rozmieszczenia z pamieci wynikow - main.py nie musi liczyc ich drugi raz
+    bestScore, bestPlacement = evaluator.evaluate(bestIndividual) if bestIndividual is not None else (0, [])
+    worstScore, worstPlacement = evaluator.evaluate(worstIndividual)
+    
+    result = {
         'bestIndividual': bestIndividual,
         'worstIndividual': worstIndividual,
+        'bestScore': bestScore,
+        'bestPlacement': bestPlacement,
+        'worstScore': worstScore,
+        'worstPlacement': worstPlacement,
         'firstGenBestScore': firstGenBestScore,
         'firstGenWorstScore': firstGenWorstScore,
-        'executionTime': endTime - startTime
+        'executionTime': endTime - startTime,
+        'generationsRun': generationsRun,
+        'stopReason': stopReason
     }
+    result.update(evaluator.stats())
+    if profiler is not None:
+        result['profile'] = profiler.report()
+    return result
+
+
+#jedna wyspa - osobny proces z wlasna populacja i wlasnym ziarnem losowania
+#co migrationInterval pokolen wysyla migrants najlepszych do nastepnej wyspy (pierscien)
+#i zastepuje swoich najgorszych osobnikami od poprzedniej
+def run_island(islandNo, seed, inbox, outbox, results, boxes, mask, width, height, generations, populationSize, mutationRate, migrationInterval, migrants, decoder, prefixCacheBytes, fitnessCacheSize, breeding):
+    startTime = time.time()
+    random.seed(seed)
+    evaluator = Evaluator(boxes, mask, width, height, decoder, prefixCacheBytes, fitnessCacheSize)
+    
+    def migrate(generation, scores):
+        if migrationInterval <= 0 or migrants <= 0 or (generation + 1) % migrationInterval != 0:
+            return scores
+        
+        outbox.put([ind for _, ind in scores[:migrants]])
+        incoming = inbox.get()
+        scores = scores[:len(scores) - len(incoming)] + score_population(evaluator, incoming)
+        scores.sort(reverse=True)
+        return scores
+    
+    result = run_to_end(optimize(evaluator, boxes, generations, populationSize, mutationRate, startTime, migrate, breeding))
+    result['island'] = islandNo
+    result['seed'] = seed
+    results.put(result)
+
+
+#blad wyspy trafia do results jako {'island': numer, 'error': wyjatek} - run_islands rzuca go dalej
+def run_island_safe(islandNo, seed, inbox, outbox, results, *args):
+    try:
+        run_island(islandNo, seed, inbox, outbox, results, *args)
+    except Exception as error:
+        #wyjatek, ktorego nie da sie przeslac miedzy procesami, zastepowany opisem
+        try:
+            pickle.dumps(error)
+        except Exception:
+            error = RuntimeError(f"{type(error).__name__}: {error}")
+        results.put({'island': islandNo, 'error': error})
+
+
+#model wyspowy: islands niezaleznych populacji, kazda w osobnym procesie
+#wynik w tym samym ksztalcie co run_optimization, plus statystyki wysp i calkowity czas
+def run_islands(boxes, mask, width, height, generations, populationSize, mutationRate, islands=4, migrationInterval=5, migrants=2, seed=None, decoder='grid', prefixCacheBytes=64 * 1024 * 1024, fitnessCacheSize=10000, breeding='list'):
+    startTime = time.time()
+    
+    #ziarna wysp wyprowadzone z ziarna uzytkownika (albo z globalnego random, ustawionego w main.py)
+    if seed is None:
+        seed = random.randrange(2 ** 63)
+    seeds = [f"{seed}-{islandNo}" for islandNo in range(islands)]
+    
+    inboxes = [multiprocessing.Queue() for _ in range(islands)]
+    results = multiprocessing.Queue()
+    processes = []
+    for islandNo in range(islands):
+        process = multiprocessing.Process(
+            target=run_island_safe,
+            args=(islandNo, seeds[islandNo], inboxes[islandNo], inboxes[(islandNo + 1) % islands], results,
+                  boxes, mask, width, height, generations, populationSize, mutationRate,
+                  migrationInterval, migrants, decoder, prefixCacheBytes, fitnessCacheSize, breeding)
+        )
+        process.start()
+        processes.append(process)
+    
+    #odbior przed join - proces nie konczy sie, dopoki kolejka nie zostanie oprozniona
+    islandResults = []
+    try:
+        while len(islandResults) < islands:
+            try:
+                islandResult = results.get(timeout=1)
+            except queue.Empty:
+                #wyspa zabita bez wyniku (np. brak pamieci) - pozostale czekalyby na nia w nieskonczonosc
+                for islandNo, process in enumerate(processes):
+                    if process.exitcode not in (None, 0):
+                        raise RuntimeError(f"Wyspa {islandNo} zakończyła się bez wyniku (kod {process.exitcode})")
+                continue
+            
+            if 'error' in islandResult:
+                raise islandResult['error']
+            islandResults.append(islandResult)
+    except BaseException:
+        #sasiedzi wyspy, ktora sie nie udala, czekaja na jej migrantow
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+    islandResults.sort(key=lambda result: result['island'])
+    
+    endTime = time.time()
+    
+    best = max(islandResults, key=lambda result: result['bestScore'])
+    worst = min(islandResults, key=lambda result: result['worstScore'])
+    #wyspa, ktora liczyla najdluzej, wyznacza koniec calego uruchomienia
+    longest = max(islandResults, key=lambda result: result['generationsRun'])
+    
+    result = {
+        'bestIndividual': best['bestIndividual'],
+        'worstIndividual': worst['worstIndividual'],
+        'bestScore': best['bestScore'],
+        'bestPlacement': best['bestPlacement'],
+        'worstScore': worst['worstScore'],
+        'worstPlacement': worst['worstPlacement'],
+        'firstGenBestScore': max(result['firstGenBestScore'] for result in islandResults),
+        'firstGenWorstScore': min(result['firstGenWorstScore'] for result in islandResults),
+        'executionTime': endTime - startTime,
+        'generationsRun': longest['generationsRun'],
+        'stopReason': longest['stopReason']
+    }
+    for name in ('cacheHits', 'cacheMisses', 'prefixCacheHits', 'prefixCacheMisses', 'reusedGenes', 'decodedGenes', 'skippedScans', 'earlyExits', 'racedOut', 'savedGenes'):
+        result[name] = sum(islandResult[name] for islandResult in islandResults)
+    
+    result['wallTime'] = endTime - startTime
+    result['islands'] = [
+        {name: islandResult[name] for name in ('island', 'seed', 'bestScore', 'worstScore', 'firstGenBestScore', 'firstGenWorstScore', 'executionTime', 'generationsRun', 'stopReason', 'cacheHits', 'cacheMisses')}
+        for islandResult in islandResults
+    ]
+    return result
+
+
+#kilka pojemnikow (np. palet) naraz: containers to lista (szerokosc, wysokosc, maska), maska None = caly dostepny
+#pojemniki sa ukladane jeden pod drugim w jedna siatke, oddzielone zablokowanym wierszem, a wezsze
+#dopelnione zablokowanymi komorkami; first-fit wierszami najpierw przechodzi caly pierwszy pojemnik,
+#potem drugi itd., wiec kazde pudelko trafia do pierwszego pojemnika, w ktorym sie miesci
+#dzieki temu dekodery, pamieci podreczne, przycinanie, procesy robocze (workers) i zapis stanu dzialaja bez zmian
+def stack_containers(containers):
+    width = max(containerWidth for containerWidth, _, _ in containers)
+    height = sum(containerHeight for _, containerHeight, _ in containers) + len(containers) - 1
+    mask = np.zeros((height, width), dtype=np.uint8)
+    
+    offsets = []
+    row = 0
+    for containerWidth, containerHeight, containerMask in containers:
+        if containerMask is None:
+            mask[row:row + containerHeight, :containerWidth] = 1
+        else:
+            mask[row:row + containerHeight, :containerWidth] = np.asarray(containerMask)[:containerHeight, :containerWidth] != 0
+        offsets.append(row)
+        row += containerHeight + 1
+    
+    return mask, width, height, offsets
+
+
+#rozmieszczenie we wspolnej siatce -> lista rozmieszczen, po jednym na pojemnik (wspolrzedne w pojemniku)
+def split_placement(placement, containers, offsets):
+    placements = [[] for _ in containers]
+    for boxId, idx, (col, row), size in placement:
+        containerNo = bisect.bisect_right(offsets, row) - 1
+        placements[containerNo].append((boxId, idx, (col, row - offsets[containerNo]), size))
+    return placements
+
+
+def run_containers(boxes, containers, generations, populationSize, mutationRate, **options):
+    return run_to_end(iterate_containers(boxes, containers, generations, populationSize, mutationRate, **options))
+
+
+#iterate_optimization dla kilku pojemnikow; opcje takie same
+#w wyniku bestPlacement i worstPlacement to listy rozmieszczen dla kolejnych pojemnikow (format jak w show_solution),
+#a 'containers' podaje rozmiar i liczbe postawionych pudelek w kazdym
+def iterate_containers(boxes, containers, generations, populationSize, mutationRate, **options):
+    containers = [(width, height, mask) for width, height, mask in containers]
+    mask, width, height, offsets = stack_containers(containers)
+    
+    result = yield from iterate_optimization(boxes, mask, width, height, generations, populationSize, mutationRate, **options)
+    
+    result['bestPlacement'] = split_placement(result['bestPlacement'], containers, offsets)
+    result['worstPlacement'] = split_placement(result['worstPlacement'], containers, offsets)
+    result['containers'] = [
+        {'width': containerWidth, 'height': containerHeight, 'placed': len(placement)}
+        for (containerWidth, containerHeight, _), placement in zip(containers, result['bestPlacement'])
+    ]
+    return result
@@ -0,0 +1,104 @@
+import json
+import time
+
+
+#pomiary czasu i licznikow optymalizacji, osobno dla kazdego pokolenia
+#wlaczane przez run_optimization(..., profile=True); wylaczony profiler to po prostu None,
+#wiec bez profilowania nie ma zadnych dodatkowych pomiarow
+#
+#fazy: evaluate, can_place (szukanie miejsca dla pudelka, wewnatrz evaluate), sort, crossover, mutate
+#liczniki: fitQueries (wywolania can_place), fitSuccesses, fitFailures,
+#candidatesTested (sprawdzone pozycje albo wolne prostokaty), cellsInspected (odczytane komorki siatki)
+#skippedScans (pudelka pominiete przez przycinanie w evaluate - bez wywolania can_place)
+
+#fazy zagniezdzone w innych - do wykresu plomieniowego (flame graph)
+PHASE_PARENTS = {
+    'can_place': 'evaluate',
+    'crossover': 'breed',
+    'mutate': 'breed'
+}
+
+
+class Profiler:
+    def __init__(self):
+        self.generations = []
+        #pokolenie 0 - ocena populacji poczatkowej
+        self.new_generation(0)
+    
+    def new_generation(self, generation):
+        self.current = {'generation': generation, 'phases': {}, 'counters': {}}
+        self.generations.append(self.current)
+    
+    def add_time(self, phase, seconds, calls=1):
+        entry = self.current['phases'].get(phase)
+        if entry is None:
+            entry = {'time': 0.0, 'calls': 0}
+            self.current['phases'][phase] = entry
+        entry['time'] += seconds
+        entry['calls'] += calls
+    
+    def count(self, name, value=1):
+        counters = self.current['counters']
+        counters[name] = counters.get(name, 0) + value
+    
+    #grid.find z pomiarem czasu i licznikami dekodera
+    def find(self, grid, w, h):
+        startTime = time.perf_counter()
+        anchor, candidates, cells = grid.find_counted(w, h)
+        self.add_time('can_place', time.perf_counter() - startTime)
+        
+        self.count('fitQueries')
+        self.count('fitSuccesses' if anchor is not None else 'fitFailures')
+        self.count('candidatesTested', candidates)
+        self.count('cellsInspected', cells)
+        return anchor
+    
+    #suma po wszystkich pokoleniach i pokolenia osobno
+    def report(self):
+        totals = {'phases': {}, 'counters': {}}
+        for generation in self.generations:
+            for phase, entry in generation['phases'].items():
+                total = totals['phases'].setdefault(phase, {'time': 0.0, 'calls': 0})
+                total['time'] += entry['time']
+                total['calls'] += entry['calls']
+            for name, value in generation['counters'].items():
+                totals['counters'][name] = totals['counters'].get(name, 0) + value
+        
+        return {'totals': totals, 'generations': self.generations}
+
+
+def write_json(report, path):
+    with open(path, 'w', encoding='utf-8') as reportFile:
+        json.dump(report, reportFile, indent=2)
+
+
+#format "collapsed stacks" (flamegraph.pl, speedscope): "ramka;ramka;ramka wartosc" w mikrosekundach
+#czas fazy nadrzednej pomniejszony o czas faz w niej zagniezdzonych
+def collapsed_stacks(report):
+    lines = []
+    for generation in report['generations']:
+        phases = generation['phases']
+        frame = f"optimize;generation {generation['generation']}"
+        
+        for phase, entry in phases.items():
+            selfTime = entry['time']
+            for child, parent in PHASE_PARENTS.items():
+                if parent == phase and child in phases:
+                    selfTime -= phases[child]['time']
+            
+            stack = [phase]
+            parent = PHASE_PARENTS.get(phase)
+            while parent is not None:
+                stack.insert(0, parent)
+                parent = PHASE_PARENTS.get(parent)
+            
+            micros = int(round(max(selfTime, 0.0) * 1e6))
+            if micros > 0:
+                lines.append(f"{frame};{';'.join(stack)} {micros}")
+    
+    return lines
+
+
+def write_collapsed(report, path):
+    with open(path, 'w', encoding='utf-8') as stacksFile:
+        stacksFile.write('\n'.join(collapsed_stacks(report)) + '\n')
@@ -0,0 +1,449 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from headless import prepare_job, run_job
+
+
+#lokalna usluga HTTP do optymalizacji - jeden proces zamiast nowego Pythona (i Qt) przy kazdym wywolaniu
+#zadania takie jak w headless.py, liczone w puli procesow; wyniki zapamietywane na dysku
+#pod kluczem sha256 z pudelek, maski, parametrow i seeda, wiec ten sam problem liczony jest tylko raz
+#
+#  POST /jobs              - nowe zadanie (JSON); 202 + id, 200 gdy wynik jest juz znany,
+#                            503 gdy kolejka jest pelna (sprobuj ponownie po Retry-After sekundach)
+#  GET  /jobs/<id>         - stan zadania (queued, running, done, failed), ostatnie pokolenie i wynik
+#  GET  /jobs/<id>/events  - postep na biezaco: jedna linia JSON na pokolenie, na koncu wynik (NDJSON)
+#  GET  /health            - zajetosc kolejki i puli
+#
+#id zadania to klucz wyniku, wiec identyczne zadania (takze w trakcie liczenia) dostaja to samo id
+
+#pola, ktore nie zmieniaja wyniku - poza kluczem
+KEY_IGNORED = ('id', 'workers')
+#zapis stanu dotyczy plikow po stronie klienta - w usludze niedostepny
+#wynik z limitem czasu zalezy od obciazenia maszyny, wiec nie moze byc zapamietany pod kluczem zadania
+REJECTED_OPTIONS = ('checkpoint', 'resume', 'timeBudget')
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+REASONS = {
+    200: 'OK',
+    202: 'Accepted',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    503: 'Service Unavailable'
+}
+
+
+#zlecenie odrzucone z kodem HTTP
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def job_key(job):
+    params, boxes, mask = prepare_job(job)
+    keyed = {name: value for name, value in params.items() if name not in KEY_IGNORED and name not in ('boxes', 'mask')}
+    payload = {'boxes': [list(box) for box in boxes], 'mask': mask, 'params': keyed, 'seed': params['seed']}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+#w procesie puli - postep wysylany przez kolejke menedzera do watku uslugi
+def run_service_job(key, job, progressQueue):
+    result = run_job(0, job, lambda stats: progressQueue.put((key, stats)))
+    result['id'] = key
+    del result['index']
+    return result
+
+
+#wyniki na dysku, jeden plik JSON na klucz; najdawniej uzywane usuwane po przekroczeniu maxBytes
+class ResultCache:
+    def __init__(self, directory, maxBytes):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+        
+        #klucz -> rozmiar, od najdawniej uzywanego (czas modyfikacji pliku)
+        files = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-len('.json')], stat.st_size))
+        self.entries = OrderedDict((key, size) for _, key, size in sorted(files))
+        self.totalBytes = sum(self.entries.values())
+        self.evict()
+    
+    def path(self, key):
+        return os.path.join(self.directory, key + '.json')
+    
+    def get(self, key):
+        if key not in self.entries:
+            return None
+        
+        try:
+            with open(self.path(key), encoding='utf-8') as resultFile:
+                result = json.load(resultFile)
+            os.utime(self.path(key))
+        except (OSError, ValueError):
+            self.remove(key)
+            return None
+        
+        self.entries.move_to_end(key)
+        return result
+    
+    #zapis atomowy, jak w checkpoint.py
+    def put(self, key, result):
+        data = json.dumps(result).encode()
+        temporaryPath = self.path(key) + '.tmp'
+        with open(temporaryPath, 'wb') as resultFile:
+            resultFile.write(data)
+        os.replace(temporaryPath, self.path(key))
+        
+        self.totalBytes += len(data) - self.entries.pop(key, 0)
+        self.entries[key] = len(data)
+        self.evict()
+    
+    def remove(self, key):
+        self.totalBytes -= self.entries.pop(key, 0)
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+    
+    def evict(self):
+        while self.totalBytes > self.maxBytes and self.entries:
+            self.remove(next(iter(self.entries)))
+
+
+class Job:
+    def __init__(self, key, job):
+        self.key = key
+        self.job = job
+        self.status = 'queued'
+        self.cached = False
+        self.events = []
+        self.result = None
+        self.error = None
+        self.changed = asyncio.Condition()
+    
+    def finished(self):
+        return self.status in ('done', 'failed')
+    
+    def summary(self):
+        summary = {
+            'id': self.key,
+            'status': self.status,
+            'cached': self.cached,
+            'progress': self.events[-1] if self.events else None
+        }
+        if self.result is not None:
+            summary['result'] = self.result
+        if self.error is not None:
+            summary['error'] = self.error
+        return summary
+    
+    #ostatnia linia strumienia postepu
+    def final_event(self):
+        if self.status == 'done':
+            return {'event': 'done', 'result': self.result}
+        return {'event': 'failed', 'error': self.error}
+
+
+class PackingService:
+    def __init__(self, cache, workers=2, queueSize=16, maxJobs=1000):
+        self.cache = cache
+        self.workers = workers
+        self.maxJobs = maxJobs
+        self.queue = asyncio.Queue(queueSize)
+        self.jobs = OrderedDict()
+        self.running = 0
+        
+        #spawn - procesy puli nie dziedzicza gniazda serwera, wiec po zamknieciu uslugi port jest od razu wolny
+        context = multiprocessing.get_context('spawn')
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        self.manager = context.Manager()
+        self.progressQueue = self.manager.Queue()
+        self.tasks = []
+        self.progressThread = None
+    
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        #tyle zadan naraz, ile procesow w puli; reszta czeka w kolejce
+        self.tasks = [asyncio.create_task(self.run_jobs()) for _ in range(self.workers)]
+        self.progressThread = threading.Thread(target=self.read_progress, daemon=True)
+        self.progressThread.start()
+    
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        self.progressQueue.put(None)
+        self.progressThread.join()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
+    
+    #watek przekazujacy postep z procesow puli do petli zdarzen
+    def read_progress(self):
+        while True:
+            try:
+                item = self.progressQueue.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            asyncio.run_coroutine_threadsafe(self.add_progress(*item), self.loop)
+    
+    async def add_progress(self, key, stats):
+        job = self.jobs.get(key)
+        #postep moze dojsc juz po wyniku - wtedy jest pomijany
+        if job is None or job.status != 'running':
+            return
+        async with job.changed:
+            job.events.append(stats)
+            job.changed.notify_all()
+    
+    async def set_status(self, job, status):
+        async with job.changed:
+            job.status = status
+            job.changed.notify_all()
+    
+    async def run_jobs(self):
+        while True:
+            job = await self.queue.get()
+            self.running += 1
+            await self.set_status(job, 'running')
+            try:
+                result = await self.loop.run_in_executor(self.pool, run_service_job, job.key, job.job, self.progressQueue)
+                #nieudany zapis wyniku (np. pelny dysk) konczy zadanie bledem zamiast zatrzymac obsluge kolejki
+                self.cache.put(job.key, result)
+            except Exception as error:
+                job.error = f"{type(error).__name__}: {error}"
+                await self.set_status(job, 'failed')
+            else:
+                job.result = result
+                await self.set_status(job, 'done')
+            finally:
+                self.running -= 1
+    
+    #nowe zadanie albo juz istniejace z tym samym kluczem; None gdy kolejka jest pelna
+    def submit(self, request):
+        if not isinstance(request, dict):
+            raise RequestError(400, "Zadanie musi byc obiektem JSON")
+        for name in REJECTED_OPTIONS:
+            if name in request:
+                raise RequestError(400, f"Opcja '{name}' nie jest dostepna w usludze")
+        
+        try:
+            key = job_key(request)
+        except (KeyError, TypeError, ValueError) as error:
+            raise RequestError(400, f"Niepoprawne zadanie: {type(error).__name__}: {error}")
+        
+        job = self.jobs.get(key)
+        if job is not None and job.status != 'failed':
+            return job
+        
+        job = Job(key, request)
+        result = self.cache.get(key)
+        if result is not None:
+            job.status = 'done'
+            job.cached = True
+            job.result = result
+        else:
+            try:
+                self.queue.put_nowait(job)
+            except asyncio.QueueFull:
+                return None
+        
+        self.jobs[key] = job
+        self.forget_old_jobs()
+        return job
+    
+    #zadanie z pamieci albo (po restarcie uslugi) z wynikow na dysku
+    def find(self, key):
+        job = self.jobs.get(key)
+        if job is None:
+            result = self.cache.get(key)
+            if result is not None:
+                job = Job(key, None)
+                job.status = 'done'
+                job.cached = True
+                job.result = result
+        return job
+    
+    def forget_old_jobs(self):
+        for key in list(self.jobs):
+            if len(self.jobs) <= self.maxJobs:
+                break
+            if self.jobs[key].finished():
+                del self.jobs[key]
+    
+    async def handle(self, reader, writer):
+        try:
+            method, path, body = await read_request(reader)
+            await self.route(method, path, body, writer)
+        except RequestError as error:
+            await send_json(writer, error.status, {'error': str(error)})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    async def route(self, method, path, body, writer):
+        parts = [part for part in path.split('?')[0].split('/') if part]
+        
+        if parts == ['health']:
+            expect_method(method, 'GET')
+            await send_json(writer, 200, {
+                'workers': self.workers,
+                'running': self.running,
+                'queued': self.queue.qsize(),
+                'queueSize': self.queue.maxsize,
+                'cachedResults': len(self.cache.entries),
+                'cacheBytes': self.cache.totalBytes
+            })
+        elif parts == ['jobs']:
+            expect_method(method, 'POST')
+            try:
+                request = json.loads(body)
+            except ValueError as error:
+                raise RequestError(400, f"Niepoprawny JSON: {error}")
+            
+            job = self.submit(request)
+            if job is None:
+                await send_json(writer, 503, {'error': "Kolejka zadan jest pelna"}, [('Retry-After', '5')])
+            else:
+                await send_json(writer, 200 if job.finished() else 202, job.summary())
+        elif len(parts) in (2, 3) and parts[0] == 'jobs' and parts[2:] in ([], ['events']):
+            expect_method(method, 'GET')
+            job = self.find(parts[1])
+            if job is None:
+                raise RequestError(404, "Nie ma takiego zadania")
+            if len(parts) == 2:
+                await send_json(writer, 200, job.summary())
+            else:
+                await self.stream_events(job, writer)
+        else:
+            raise RequestError(404, "Nie ma takiego adresu")
+    
+    #postep jako NDJSON, odpowiedz konczy sie zamknieciem polaczenia
+    async def stream_events(self, job, writer):
+        writer.write(response_head(200, 'application/x-ndjson', [('Cache-Control', 'no-cache')]))
+        sent = 0
+        while True:
+            async with job.changed:
+                await job.changed.wait_for(lambda: len(job.events) > sent or job.finished())
+                events = job.events[sent:]
+                finished = job.finished()
+            
+            for stats in events:
+                writer.write((json.dumps({'event': 'progress', **stats}) + '\n').encode())
+            sent += len(events)
+            if finished:
+                writer.write((json.dumps(job.final_event()) + '\n').encode())
+            await writer.drain()
+            if finished:
+                return
+
+
+def expect_method(method, expected):
+    if method != expected:
+        raise RequestError(405, f"Dozwolona metoda: {expected}")
+
+
+#(metoda, sciezka, tresc) - tylko to, czego potrzebuje usluga; kazde polaczenie to jedno zapytanie
+async def read_request(reader):
+    requestLine = (await reader.readline()).decode('latin-1').split()
+    if len(requestLine) != 3:
+        raise RequestError(400, "Niepoprawne zapytanie HTTP")
+    method, path, _ = requestLine
+    
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1')
+        if line in ('\r\n', '\n', ''):
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    
+    try:
+        length = int(headers.get('content-length', 0) or 0)
+    except ValueError:
+        raise RequestError(400, "Niepoprawny naglowek Content-Length")
+    if length < 0:
+        raise RequestError(400, "Niepoprawny naglowek Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, "Za duze zadanie")
+    body = await reader.readexactly(length) if length > 0 else b''
+    return method, path, body
+
+
+def response_head(status, contentType, headers=(), length=None):
+    lines = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Type: {contentType}", "Connection: close"]
+    if length is not None:
+        lines.append(f"Content-Length: {length}")
+    lines.extend(f"{name}: {value}" for name, value in headers)
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def send_json(writer, status, payload, headers=()):
+    body = json.dumps(payload).encode()
+    writer.write(response_head(status, 'application/json', headers, len(body)) + body)
+    await writer.drain()
+
+
+async def serve(args):
+    cache = ResultCache(args.cache_dir, args.cache_bytes)
+    service = PackingService(cache, args.workers, args.queue_size)
+    service.start()
+    
+    if args.unix:
+        server = await asyncio.start_unix_server(service.handle, path=args.unix)
+        address = args.unix
+    else:
+        server = await asyncio.start_server(service.handle, args.host, args.port)
+        address = f"http://{args.host}:{args.port}"
+    print(f"Usluga optymalizacji: {address}", file=sys.stderr, flush=True)
+    
+    #SIGINT i SIGTERM zamykaja usluge porzadnie (na Windows zostaje KeyboardInterrupt)
+    stop = asyncio.Event()
+    for signalNumber in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signalNumber, stop.set)
+        except NotImplementedError:
+            pass
+    
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokalna usługa optymalizacji pakowania pudełek")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="gniazdo Unix zamiast TCP")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1), help="procesy liczace zadania")
+    parser.add_argument('--queue-size', type=int, default=16, help="ile zadan moze czekac, zanim usluga zwroci 503")
+    parser.add_argument('--cache-dir', default='.box-optimizer-cache')
+    parser.add_argument('--cache-bytes', type=int, default=256 * 1024 * 1024, help="limit rozmiaru wynikow na dysku")
+    args = parser.parse_args(argv)
+    
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
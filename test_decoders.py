@@ -0,0 +1,132 @@
+import random
+
+import pytest
+
+from optimizer import DECODERS, Evaluator, MaskIndex, can_place, evaluate, evaluate_population, generate_individual, place, split_placement, stack_containers
+
+
+#pierwotne evaluate - pelne skanowanie siatki z can_place, wzorzec dla wszystkich dekoderow
+def reference_evaluate(individual, mask, boxes, width, height):
+    grid = [[0] * width for _ in range(height)]
+    placed = []
+    
+    for idx, rotated in individual:
+        w, h = boxes[idx]
+        if rotated:
+            w, h = h, w
+        
+        anchor = next(((i, j) for i in range(height) for j in range(width) if can_place(grid, i, j, w, h, mask)), None)
+        if anchor is not None:
+            i, j = anchor
+            place(grid, i, j, w, h, len(placed) + 1)
+            placed.append((len(placed) + 1, idx, (j, i), (w, h)))
+    
+    return len(placed), placed
+
+
+#losowe male zadania: rozmiar siatki, gestosc przeszkod w masce (0 - bez maski), pudelka i osobnik
+def random_cases(count, seed, densities):
+    caseRandom = random.Random(seed)
+    random.seed(seed)
+    for _ in range(count):
+        width = caseRandom.randint(1, 20)
+        height = caseRandom.randint(1, 20)
+        density = caseRandom.choice(densities)
+        mask = [[0 if caseRandom.random() < density else 1 for _ in range(width)] for _ in range(height)]
+        high = caseRandom.randint(1, 8)
+        boxes = [(caseRandom.randint(1, high), caseRandom.randint(1, high)) for _ in range(caseRandom.randint(1, 40))]
+        yield mask, boxes, width, height, generate_individual(boxes)
+
+
+@pytest.mark.parametrize('decoder', sorted(DECODERS))
+@pytest.mark.parametrize('densities', [(0.0,), (0.1, 0.5, 0.9)], ids=['bez-maski', 'z-maska'])
+def test_decoder_matches_reference_scan(decoder, densities):
+    for mask, boxes, width, height, individual in random_cases(150, 3, densities):
+        expected = reference_evaluate(individual, mask, boxes, width, height)
+        assert evaluate(individual, mask, boxes, width, height, decoder=decoder) == expected
+
+
+#cala populacja naraz - kazdy osobnik tak samo jak przy pojedynczym skanowaniu
+@pytest.mark.parametrize('densities', [(0.0,), (0.1, 0.5, 0.9)], ids=['bez-maski', 'z-maska'])
+def test_lockstep_population_matches_reference_scan(densities):
+    for mask, boxes, width, height, _ in random_cases(60, 5, densities):
+        population = [generate_individual(boxes) for _ in range(8)]
+        expected = [reference_evaluate(individual, mask, boxes, width, height) for individual in population]
+        assert evaluate_population(population, mask, boxes, width, height) == expected
+
+
+#ciasne zadania (duze pudelka, gesta maska) - przycinanie pomija wyszukiwania i konczy dekodowanie wczesniej,
+#ale rozmieszczenie pozostaje takie jak przy pelnym skanowaniu
+def test_pruning_keeps_reference_placements():
+    pruning = {'skippedScans': 0, 'earlyExits': 0}
+    for mask, boxes, width, height, individual in random_cases(150, 9, (0.3, 0.6)):
+        expected = reference_evaluate(individual, mask, boxes, width, height)
+        assert evaluate(individual, mask, boxes, width, height, pruning=pruning) == expected
+    assert pruning['skippedScans'] > 0
+    assert pruning['earlyExits'] > 0
+
+
+#prawie pusta maska - mapa bitowa zamiast listy pozycji; mocno zablokowana - krotka lista
+#indeks ksztaltu powstaje dopiero przy pierwszym uzyciu, a dekoder maxrects go nie buduje
+def test_mask_index_is_compact_and_lazy():
+    mask = [[1] * 200 for _ in range(200)]
+    mask[100][100] = 0
+    maskIndex = MaskIndex(mask, 200, 200)
+    assert maskIndex.shapes == {}
+    
+    anchors = maskIndex.anchors(10, 10)
+    assert anchors.dense and anchors.count == 191 * 191 - 100
+    assert anchors.allowed.nbytes == -(-191 * 191 // 8)
+    
+    blocked = [[1 if i % 20 == 0 and j % 20 == 0 else 0 for j in range(200)] for i in range(200)]
+    anchors = MaskIndex(blocked, 200, 200).anchors(1, 1)
+    assert not anchors.dense and anchors.topLeft.nbytes == 4 * 100
+    
+    boxes = [(w, h) for w in range(1, 6) for h in range(1, 6)]
+    evaluator = Evaluator(boxes, mask, 200, 200, decoder='maxrects', prefixCacheBytes=0)
+    evaluator.evaluate(generate_individual(boxes))
+    assert evaluator.maskIndex.shapes == {}
+
+
+#pierwotne first-fit dla kilku pojemnikow: pudelko trafia do pierwszego pojemnika, w ktorym skanowanie can_place znajdzie miejsce
+def reference_containers(individual, containers, boxes):
+    grids = [[[0] * width for _ in range(height)] for width, height, _ in containers]
+    masks = [mask if mask is not None else [[1] * width for _ in range(height)] for width, height, mask in containers]
+    placements = [[] for _ in containers]
+    boxId = 1
+    
+    for idx, rotated in individual:
+        w, h = boxes[idx]
+        if rotated:
+            w, h = h, w
+        
+        for grid, mask, placement, (width, height, _) in zip(grids, masks, placements, containers):
+            anchor = next(((i, j) for i in range(height) for j in range(width) if can_place(grid, i, j, w, h, mask)), None)
+            if anchor is not None:
+                i, j = anchor
+                place(grid, i, j, w, h, boxId)
+                placement.append((boxId, idx, (j, i), (w, h)))
+                boxId += 1
+                break
+    
+    return placements
+
+
+#pojemniki o roznej szerokosci, jeden z maska - wspolna siatka daje to samo co first-fit po kolei w kazdym pojemniku
+@pytest.mark.parametrize('decoder', sorted(DECODERS))
+def test_stacked_containers_match_per_container_first_fit(decoder):
+    caseRandom = random.Random(11)
+    random.seed(11)
+    for _ in range(200):
+        containers = []
+        for _ in range(caseRandom.randint(1, 4)):
+            width = caseRandom.randint(1, 12)
+            height = caseRandom.randint(1, 12)
+            mask = [[0 if caseRandom.random() < 0.3 else 1 for _ in range(width)] for _ in range(height)] if caseRandom.random() < 0.5 else None
+            containers.append((width, height, mask))
+        boxes = [(caseRandom.randint(1, 6), caseRandom.randint(1, 6)) for _ in range(caseRandom.randint(1, 30))]
+        individual = generate_individual(boxes)
+        
+        mask, width, height, offsets = stack_containers(containers)
+        score, placement = evaluate(individual, mask, boxes, width, height, decoder=decoder)
+        assert split_placement(placement, containers, offsets) == reference_containers(individual, containers, boxes)
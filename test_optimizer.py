@@ -0,0 +1,204 @@
+import random
+import threading
+import time
+
+import pytest
+
+from main import generate_boxes
+from optimizer import Evaluator, PrefixCache, evaluate, generate_individual, optimize, run_containers, run_islands, run_optimization, run_to_end
+
+
+#wynik albo wyjatek funkcji; zawieszenie konczy test bledem zamiast blokowac cale pytest
+def call_with_timeout(function, timeout=60):
+    outcome = {}
+    
+    def target():
+        try:
+            outcome['result'] = function()
+        except Exception as error:
+            outcome['error'] = error
+    
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "funkcja zawiesila sie"
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+def random_boxes(seed, count, low=1, high=3):
+    boxRandom = random.Random(seed)
+    return [(boxRandom.randint(low, high), boxRandom.randint(low, high)) for _ in range(count)]
+
+
+def full_mask(width, height):
+    return [[1] * width for _ in range(height)]
+
+
+def test_island_error_reaches_parent():
+    boxes = random_boxes(1, 30)
+    with pytest.raises(KeyError):
+        call_with_timeout(lambda: run_islands(boxes, full_mask(10, 10), 10, 10, 5, 10, 0.5, islands=3, decoder='bogus'))
+
+
+#wyspa, ktora postawi wszystkie pudelka, nie moze przestac wysylac migrantow - sasiad czekalby na nie bez konca
+#(pudelka o lacznym polu 95 na siatce 10 x 10 - czesc wysp stawia wszystkie, czesc nie)
+def test_islands_finish_when_some_place_all_boxes():
+    boxRandom = random.Random(1)
+    boxes = []
+    while sum(w * h for w, h in boxes) < 95:
+        w, h = boxRandom.randint(1, 3), boxRandom.randint(1, 3)
+        if sum(bw * bh for bw, bh in boxes) + w * h <= 95:
+            boxes.append((w, h))
+    
+    result = call_with_timeout(lambda: run_islands(boxes, full_mask(10, 10), 10, 10, 20, 10, 0.5, islands=4, migrationInterval=1, seed=1))
+    assert len(result['islands']) == 4
+    assert result['bestScore'] <= len(boxes)
+
+
+#wynik modelu wyspowego ma wszystkie pola wyniku run_optimization (np. dla headless.run_job)
+def test_island_result_has_run_optimization_keys():
+    boxes = random_boxes(2, 40)
+    single = run_optimization(boxes, full_mask(10, 10), 10, 10, 4, 10, 0.5)
+    result = call_with_timeout(lambda: run_islands(boxes, full_mask(10, 10), 10, 10, 4, 10, 0.5, islands=2, seed=1))
+    assert set(single) <= set(result)
+    assert result['generationsRun'] == 4
+    assert result['stopReason'] == 'generations'
+
+
+#z migracja petla nie konczy sie po postawieniu wszystkich pudelek - kazda wymiana musi sie odbyc
+def test_migration_continues_after_all_boxes_placed():
+    boxes = [(1, 1)] * 5
+    evaluator = Evaluator(boxes, full_mask(4, 4), 4, 4)
+    migrations = []
+    
+    def migrate(generation, scores):
+        migrations.append(generation)
+        return scores
+    
+    result = run_to_end(optimize(evaluator, boxes, 6, 10, 0.5, time.time(), migrate))
+    assert result['bestScore'] == len(boxes)
+    assert result['stopReason'] == 'generations'
+    assert migrations == list(range(6))
+
+
+#pola wyniku, ktore musza byc takie same, gdy przebieg algorytmu genetycznego sie nie zmienia
+TRAJECTORY_KEYS = ('bestIndividual', 'bestScore', 'bestPlacement', 'worstIndividual', 'worstScore', 'firstGenBestScore', 'firstGenWorstScore', 'generationsRun', 'stopReason')
+
+
+#siatka 16 x 16 z przeszkodami i 150 pudelkami, jak w domyslnym zadaniu
+def reference_problem():
+    random.seed(44)
+    boxes = generate_boxes(150, 1, 5, 1, 5)
+    mask = [[0 if (i * 7 + j * 3) % 11 == 0 else 1 for j in range(16)] for i in range(16)]
+    return boxes, mask
+
+
+def run_trajectory(generations=10, populationSize=50, **options):
+    boxes, mask = reference_problem()
+    random.seed(7)
+    result = run_optimization(boxes, mask, 16, 16, generations, populationSize, 0.5, **options)
+    return {name: result[name] for name in TRAJECTORY_KEYS}
+
+
+#bez pamieci podrecznych - wzorzec dla wszystkich optymalizacji oceny
+def plain_trajectory(**options):
+    return run_trajectory(prefixCacheBytes=0, fitnessCacheSize=0, **options)
+
+
+def test_prefix_cache_keeps_trajectory():
+    assert run_trajectory(fitnessCacheSize=0) == plain_trajectory()
+
+
+#wszystkie prefiksy tej samej dlugosci maja ten sam klucz - kazde trafienie bez sprawdzenia genow byloby kolizja
+class CollidingPrefixCache(PrefixCache):
+    def prefix_keys(self, individual):
+        return [(position, 0) for position in range(self.stride, len(individual) + 1, self.stride)]
+
+
+def test_prefix_cache_ignores_hash_collisions():
+    boxes, mask = reference_problem()
+    prefixCache = CollidingPrefixCache(stride=8)
+    random.seed(3)
+    for _ in range(30):
+        individual = generate_individual(boxes)
+        assert evaluate(individual, mask, boxes, 16, 16, prefixCache=prefixCache) == evaluate(individual, mask, boxes, 16, 16)
+        #ten sam osobnik jeszcze raz - wznowienie z wlasnego prefiksu
+        assert evaluate(individual, mask, boxes, 16, 16, prefixCache=prefixCache) == evaluate(individual, mask, boxes, 16, 16)
+    assert prefixCache.hits == 30
+
+
+def test_fitness_cache_keeps_trajectory():
+    assert run_trajectory(prefixCacheBytes=0) == plain_trajectory()
+
+
+#pudelka o tym samym ksztalcie sa wymienne - trafienie w pamieci wynikow daje rozmieszczenie z wlasnymi indeksami
+def test_fitness_cache_hit_for_swapped_identical_shapes():
+    boxes = [(2, 3), (1, 1), (3, 2), (2, 3), (1, 1)]
+    mask = full_mask(5, 5)
+    evaluator = Evaluator(boxes, mask, 5, 5, prefixCacheBytes=0)
+    
+    individual = [(0, False), (1, False), (2, True), (3, False), (4, False)]
+    swapped = [(3, False), (4, False), (0, False), (2, True), (1, False)]
+    evaluator.evaluate(individual)
+    assert evaluator.evaluate(swapped) == evaluate(swapped, mask, boxes, 5, 5)
+    assert evaluator.fitnessCache.hits == 1
+
+
+def test_worker_pool_keeps_trajectory():
+    assert run_trajectory(workers=2) == run_trajectory()
+
+
+def test_lockstep_keeps_trajectory():
+    assert run_trajectory(lockstep=True) == run_trajectory()
+
+
+#przerwany przebieg wznowiony z pliku checkpoint konczy sie tak samo jak przebieg bez przerwy,
+#niezaleznie od stanu generatora liczb losowych w chwili wznowienia
+@pytest.mark.parametrize('breeding', ['list', 'array'])
+def test_checkpoint_resume_keeps_trajectory(breeding, tmp_path):
+    path = str(tmp_path / 'run.ckpt')
+    options = dict(generations=40, populationSize=30, breeding=breeding, stagnation=25)
+    expected = run_trajectory(**options)
+    
+    calls = []
+    
+    def stop():
+        calls.append(None)
+        return len(calls) >= 25
+    
+    interrupted = run_trajectory(checkpoint=path, checkpointInterval=10, stop=stop, **options)
+    assert interrupted['stopReason'] == 'cancelled'
+    
+    boxes, mask = reference_problem()
+    random.seed(999)
+    resumed = run_optimization(boxes, mask, 16, 16, 40, 30, 0.5, breeding=breeding, stagnation=25, checkpoint=path, checkpointInterval=10, resume=True)
+    assert {name: resumed[name] for name in TRAJECTORY_KEYS} == expected
+
+
+#wyscig zaniza tylko wyniki osobnikow bez szans na najlepsze miejsce - przebieg bez zmian
+@pytest.mark.parametrize('workers', [0, 2])
+def test_racing_keeps_best_trajectory(workers):
+    boxes, mask = reference_problem()
+    random.seed(7)
+    result = run_optimization(boxes, mask, 16, 16, 10, 50, 0.5, racing=4, workers=workers)
+    expected = run_trajectory()
+    assert {name: result[name] for name in TRAJECTORY_KEYS} == expected
+    assert result['racedOut'] > 0
+
+
+def test_run_containers_reports_each_container():
+    boxes = random_boxes(4, 60)
+    blocked = [[0 if (i + j) % 5 == 0 else 1 for j in range(6)] for i in range(8)]
+    containers = [(10, 6, None), (6, 8, blocked), (4, 4, None)]
+    random.seed(2)
+    result = run_containers(boxes, containers, 5, 10, 0.5)
+    
+    assert len(result['bestPlacement']) == len(containers)
+    assert [container['placed'] for container in result['containers']] == [len(placement) for placement in result['bestPlacement']]
+    assert sum(container['placed'] for container in result['containers']) == result['bestScore']
+    for (width, height, mask), placement in zip(containers, result['bestPlacement']):
+        for _, _, (x, y), (w, h) in placement:
+            assert x + w <= width and y + h <= height
+            assert mask is None or all(mask[y + i][x + j] for i in range(h) for j in range(w))
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+
+from headless import run_job
+from service import PackingService, ResultCache
+
+
+#male zadanie liczone w ulamku sekundy
+SMALL_JOB = {'seed': 1, 'gridWidth': 8, 'gridHeight': 8, 'boxCount': 20, 'generations': 3, 'populationSize': 6}
+
+
+#usluga na wolnym porcie localhost; test(port) dostaje port i zwraca wynik
+def with_service(tmp_path, test, workers=1, queueSize=16, cacheBytes=1024 * 1024):
+    async def main():
+        cache = ResultCache(str(tmp_path / 'cache'), cacheBytes)
+        service = PackingService(cache, workers, queueSize)
+        service.start()
+        try:
+            server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+            async with server:
+                return await asyncio.wait_for(test(server.sockets[0].getsockname()[1]), 120)
+        finally:
+            service.close()
+    
+    return asyncio.run(main())
+
+
+#jedno zapytanie HTTP -> (kod, naglowki, tresc); length nadpisuje naglowek Content-Length
+async def request(port, method, path, body=None, length=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    if body is None:
+        data = b''
+    elif isinstance(body, bytes):
+        data = body
+    else:
+        data = json.dumps(body).encode()
+    
+    head = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(data) if length is None else length}"]
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+    await writer.drain()
+    
+    #usluga zamyka polaczenie po odpowiedzi
+    response = await reader.read()
+    writer.close()
+    
+    head, _, content = response.partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return int(lines[0].split()[1]), headers, content
+
+
+async def request_json(port, method, path, body=None, length=None):
+    status, headers, content = await request(port, method, path, body, length)
+    return status, json.loads(content)
+
+
+#strumien postepu do konca zadania - lista zdarzen NDJSON
+async def events(port, key):
+    status, headers, content = await request(port, 'GET', f'/jobs/{key}/events')
+    assert status == 200
+    assert headers['content-type'] == 'application/x-ndjson'
+    return [json.loads(line) for line in content.decode().splitlines()]
+
+
+def test_job_status_and_event_stream(tmp_path):
+    async def test(port):
+        status, submitted = await request_json(port, 'POST', '/jobs', SMALL_JOB)
+        assert status == 202
+        assert submitted['status'] in ('queued', 'running')
+        
+        status, job = await request_json(port, 'GET', f"/jobs/{submitted['id']}")
+        assert status == 200
+        assert job['id'] == submitted['id']
+        
+        stream = await events(port, submitted['id'])
+        assert [event['event'] for event in stream] == ['progress'] * SMALL_JOB['generations'] + ['done']
+        
+        status, job = await request_json(port, 'GET', f"/jobs/{submitted['id']}")
+        assert job['status'] == 'done'
+        assert job['result'] == stream[-1]['result']
+        return job['result']
+    
+    result = with_service(tmp_path, test)
+    expected = run_job(0, SMALL_JOB)
+    assert result['bestScore'] == expected['bestScore']
+    assert result['placement'] == expected['placement']
+
+
+def test_identical_jobs_dedupe_and_repeat_from_cache(tmp_path):
+    async def test(port):
+        _, first = await request_json(port, 'POST', '/jobs', SMALL_JOB)
+        #pola spoza klucza (id, workers) nie tworza nowego zadania
+        _, second = await request_json(port, 'POST', '/jobs', {**SMALL_JOB, 'id': 'inne', 'workers': 2})
+        assert second['id'] == first['id']
+        await events(port, first['id'])
+        
+        status, repeated = await request_json(port, 'POST', '/jobs', SMALL_JOB)
+        assert status == 200
+        assert repeated['status'] == 'done'
+        return first['id'], repeated['result']
+    
+    key, result = with_service(tmp_path, test)
+    
+    #nowa usluga z tym samym katalogiem - wynik prosto z dysku, bez liczenia
+    async def restarted(port):
+        status, job = await request_json(port, 'POST', '/jobs', SMALL_JOB)
+        assert status == 200
+        assert job['cached']
+        assert job['result'] == result
+        status, job = await request_json(port, 'GET', f'/jobs/{key}')
+        assert status == 200
+        assert job['result'] == result
+    
+    with_service(tmp_path, restarted)
+
+
+def test_full_queue_returns_503(tmp_path):
+    async def test(port):
+        #jedno zadanie liczone, jedno w kolejce - kolejne nie ma juz miejsca
+        responses = []
+        for seed in range(3):
+            responses.append(await request(port, 'POST', '/jobs', {**SMALL_JOB, 'seed': seed, 'boxCount': 60, 'generations': 200, 'populationSize': 30}))
+        
+        status, headers, content = responses[-1]
+        assert [response[0] for response in responses[:2]] == [202, 202]
+        assert status == 503
+        assert headers['retry-after'] == '5'
+        assert 'error' in json.loads(content)
+    
+    with_service(tmp_path, test, queueSize=1)
+
+
+def test_bad_requests_return_400(tmp_path):
+    async def test(port):
+        assert (await request(port, 'POST', '/jobs', b'{nie json'))[0] == 400
+        assert (await request(port, 'POST', '/jobs', [SMALL_JOB]))[0] == 400
+        assert (await request(port, 'POST', '/jobs', {**SMALL_JOB, 'boxes': 5}))[0] == 400
+        for option in ('checkpoint', 'resume', 'timeBudget'):
+            assert (await request(port, 'POST', '/jobs', {**SMALL_JOB, option: 1}))[0] == 400
+        for length in ('abc', '-5'):
+            status, body = await request_json(port, 'POST', '/jobs', b'', length)
+            assert status == 400
+            assert 'Content-Length' in body['error']
+        assert (await request(port, 'GET', '/jobs/nieznane'))[0] == 404
+        assert (await request(port, 'GET', '/jobs'))[0] == 405
+    
+    with_service(tmp_path, test)
+
+
+def test_result_cache_evicts_least_recently_used_at_byte_limit(tmp_path):
+    directory = str(tmp_path / 'cache')
+    result = {'placement': 'x' * 100}
+    size = len(json.dumps(result).encode())
+    
+    cache = ResultCache(directory, 2 * size)
+    cache.put('a', result)
+    cache.put('b', result)
+    #odczyt odswieza 'a' - usuwane jest 'b'
+    assert cache.get('a') == result
+    cache.put('c', result)
+    assert sorted(cache.entries) == ['a', 'c']
+    assert cache.totalBytes == 2 * size
+    assert sorted(os.listdir(directory)) == ['a.json', 'c.json']
+    
+    #mniejszy limit przy ponownym otwarciu - zostaje ostatnio uzywany wynik
+    cache = ResultCache(directory, size)
+    assert list(cache.entries) == ['c']
+    assert os.listdir(directory) == ['c.json']
@@ -1,19 +1,31 @@
 import sys
+import math
 import random
+import numpy as np
 from PyQt6.QtWidgets import QApplication, QWidget, QMainWindow
-from PyQt6.QtCore import Qt, QRect
-from PyQt6.QtGui import QPainter, QColor, QPen, QFont
+from PyQt6.QtCore import Qt, QRectF, QPointF
+from PyQt6.QtGui import QPainter, QColor, QPen, QFont, QFontMetrics, QImage, QPixmap
+
+#najwiekszy poczatkowy rozmiar widoku - wieksze siatki sa pomniejszane, dalej zoom kolkiem myszy
+MAX_VIEW_WIDTH = 1200
+MAX_VIEW_HEIGHT = 900
+MAX_CELL_SIZE = 200
+
+BACKGROUND_COLOR = QColor(60, 60, 60)
+BLOCKED_COLOR = QColor(0, 0, 0)
 
 #widget na którym można rysować
+#maska i pudelka sa rysowane raz do obrazka (jeden piksel na komorke), a paintEvent tylko
+#skaluje widoczny fragment obrazka i dopisuje numery pudelek, ktore sie mieszcza
+#kolko myszy - zoom, przeciaganie - przesuwanie, podwojne klikniecie - cala siatka
 class GridWidget(QWidget):
-    
+
     def __init__(self, placement, mask, gridWidth, gridHeight, cellSize=40):
         super().__init__()
         self.placement = placement
         self.mask = mask
         self.gridWidth = gridWidth
         self.gridHeight = gridHeight
-        self.cellSize = cellSize
         
         #generuj losowe kolory dla kazdego pudelka co sie udalo postawic
         self.boxColors = {}
@@ -24,53 +36,126 @@ class GridWidget(QWidget):
                 random.randint(100, 255)
             )
         
+        self.labelFont = QFont('Arial', 12, QFont.Weight.Bold)
+        self.labelMetrics = QFontMetrics(self.labelFont)
+        self.maxBoxSide = max((max(w, h) for _, _, _, (w, h) in placement), default=0)
+        
+        #prostokaty pudelek (x, y, w, h) i szerokosc numeru - widoczne pudelka wybierane jedna operacja na tablicach
+        self.boxRects = np.array([(x, y, w, h) for _, _, (x, y), (w, h) in placement], dtype=np.float64).reshape(-1, 4)
+        self.labelWidths = np.array([self.labelMetrics.horizontalAdvance(str(boxId)) for boxId, _, _, _ in placement], dtype=np.float64)
+        
+        self.render_static_layer()
+        
+        #duze siatki zaczynaja pomniejszone, tak zeby okno miescilo sie na ekranie
+        self.cellSize = min(float(cellSize), MAX_VIEW_WIDTH / gridWidth, MAX_VIEW_HEIGHT / gridHeight)
+        self.offset = QPointF(0, 0)
+        self.dragStart = None
+        
         #rozmiar widgetu
         self.setMinimumSize(
-            gridWidth * cellSize + 1,
-            gridHeight * cellSize + 1
+            min(math.ceil(gridWidth * self.cellSize) + 1, MAX_VIEW_WIDTH),
+            min(math.ceil(gridHeight * self.cellSize) + 1, MAX_VIEW_HEIGHT)
+        )
+    
+    #obrazek siatki (piksel = komorka)
+    def render_static_layer(self):
+        #maska moze byc wieksza niz siatka (np. po zmniejszeniu siatki bez ponownej edycji maski)
+        blocked = np.asarray(self.mask)[:self.gridHeight, :self.gridWidth] == 0
+        pixels = np.where(blocked, np.uint32(BLOCKED_COLOR.rgb()), np.uint32(BACKGROUND_COLOR.rgb())).astype(np.uint32)
+        
+        for boxId, idx, (x, y), (w, h) in self.placement:
+            pixels[y:y + h, x:x + w] = self.boxColors[boxId].rgb()
+        
+        #copy() - QImage nie moze zalezec od bufora numpy
+        image = QImage(pixels.data, self.gridWidth, self.gridHeight, self.gridWidth * 4, QImage.Format.Format_RGB32).copy()
+        self.pixmap = QPixmap.fromImage(image)
+    
+    #zakres widocznych komorek (kolumny i wiersze, bez konca)
+    def visible_cells(self):
+        left = max(0, math.floor(-self.offset.x() / self.cellSize))
+        top = max(0, math.floor(-self.offset.y() / self.cellSize))
+        right = min(self.gridWidth, math.ceil((self.width() - self.offset.x()) / self.cellSize))
+        bottom = min(self.gridHeight, math.ceil((self.height() - self.offset.y()) / self.cellSize))
+        return left, top, right, bottom
+    
+    def cell_rect(self, x, y, w, h):
+        return QRectF(
+            self.offset.x() + x * self.cellSize,
+            self.offset.y() + y * self.cellSize,
+            w * self.cellSize,
+            h * self.cellSize
         )
     
-
     def paintEvent(self, event):
         painter = QPainter(self)
-
+        
         painter.setPen(Qt.PenStyle.NoPen)
-        painter.setBrush(QColor(60, 60, 60))
+        painter.setBrush(BACKGROUND_COLOR)
         painter.drawRect(self.rect())
-
-        #komorki niedostepne na czarno
-        for i in range(self.gridHeight):
-            for j in range(self.gridWidth):
-                x = j * self.cellSize
-                y = i * self.cellSize
-                if self.mask[i][j] == 0:
-                    # ciemne, półprzezroczyste wypełnienie
-                    painter.setPen(Qt.PenStyle.NoPen)
-                    painter.setBrush(QColor(0,0,0))
-                    painter.drawRect(x, y, self.cellSize, self.cellSize)
-
-
-        #rysuj pudelka
-        painter.setPen(Qt.PenStyle.NoPen)
-        for boxId, idx, (x, y), (w, h) in self.placement:
-            painter.setBrush(self.boxColors[boxId])
-
-            rectX = x * self.cellSize
-            rectY = y * self.cellSize
-            rectW = w * self.cellSize
-            rectH = h * self.cellSize
-
-            painter.drawRect(rectX, rectY, rectW, rectH)
-
+        
+        left, top, right, bottom = self.visible_cells()
+        if left >= right or top >= bottom:
+            return
+        
+        #tylko widoczny fragment, bez wygladzania - komorki zostaja ostrymi kwadratami
+        painter.drawPixmap(
+            self.cell_rect(left, top, right - left, bottom - top),
+            self.pixmap,
+            QRectF(left, top, right - left, bottom - top)
+        )
+        
+        #numery pudelek tylko gdy jest szansa, ze sie zmieszcza
+        if self.maxBoxSide * self.cellSize < self.labelMetrics.height():
+            return
+        
+        painter.setPen(Qt.GlobalColor.black)
+        painter.setFont(self.labelFont)
+        #pudelka nachodzace na widoczne komorki, w ktorych miesci sie numer
+        xs, ys, ws, hs = self.boxRects.T
+        visible = (xs < right) & (xs + ws > left) & (ys < bottom) & (ys + hs > top)
+        visible &= (ws * self.cellSize >= self.labelWidths) & (hs * self.cellSize >= self.labelMetrics.height())
+        for index in np.flatnonzero(visible):
+            boxId, idx, (x, y), (w, h) = self.placement[index]
+            
             #numer pudelka
-            painter.setPen(Qt.GlobalColor.black)
-            painter.setFont(QFont('Arial', 12, QFont.Weight.Bold))
-            painter.drawText(
-                QRect(rectX, rectY, rectW, rectH),
-                Qt.AlignmentFlag.AlignCenter,
-                str(boxId)
-            )
-            painter.setPen(Qt.PenStyle.NoPen)
+            painter.drawText(self.cell_rect(x, y, w, h), Qt.AlignmentFlag.AlignCenter, str(boxId))
+    
+    #zoom wokol kursora
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        if steps == 0:
+            return
+        
+        minCellSize = min(self.width() / self.gridWidth, self.height() / self.gridHeight) / 2
+        cellSize = min(max(self.cellSize * 1.25 ** steps, minCellSize), MAX_CELL_SIZE)
+        
+        position = event.position()
+        scale = cellSize / self.cellSize
+        self.offset = position - (position - self.offset) * scale
+        self.cellSize = cellSize
+        self.update()
+    
+    def mousePressEvent(self, event):
+        if event.button() in (Qt.MouseButton.LeftButton, Qt.MouseButton.MiddleButton):
+            self.dragStart = event.position()
+    
+    def mouseMoveEvent(self, event):
+        if self.dragStart is None:
+            return
+        
+        position = event.position()
+        self.offset += position - self.dragStart
+        self.dragStart = position
+        self.update()
+    
+    def mouseReleaseEvent(self, event):
+        self.dragStart = None
+    
+    #podwojne klikniecie - cala siatka w oknie
+    def mouseDoubleClickEvent(self, event):
+        self.cellSize = min(self.width() / self.gridWidth, self.height() / self.gridHeight, MAX_CELL_SIZE)
+        self.offset = QPointF(0, 0)
+        self.update()
 
 def show_solution(placement, mask, gridWidth, gridHeight):
     #tworzenie instancji aplikacji